@@ -1,15 +1,127 @@
 # app.py
-from flask import Flask, request, jsonify
+import importlib
+import logging
+from utils.startup import startup_report
 
-from orchestrator import ComplianceOrchestrator
-from config import Config
-from scripts.build_all_vector_stores import build_all_vector_stores
-from simple_orchestrator import SimpleComplianceOrchestrator
+with startup_report.step("import flask"):
+    import json
+    from flask import Flask, Response, request, jsonify, stream_with_context
+
+# Lightweight on purpose: handlers, FAISS, LangChain and the embedding model are imported
+# on first use (or by the opt-in warm-up below), not when a worker process starts
+with startup_report.step("import config"):
+    from config import Config
+
+with startup_report.step("import services"):
+    from services.handler_registry import HandlerRegistry
+    from services.job_manager import JobQueueFullError, get_job_manager
+    from utils.metrics import render_prometheus
+
+with startup_report.step("import orchestrator"):
+    from simple_orchestrator import SimpleComplianceOrchestrator
 
 app = Flask(__name__)
-Config.create_dirs()  # Create folders on boot
 
-# build_all_vector_stores()
+
+def _timed_import(step: str, *modules: str):
+    """Import modules as one startup step; a failure is left for the warm-up to report"""
+    with startup_report.step(step):
+        for module in modules:
+            try:
+                importlib.import_module(module)
+            except ImportError as e:
+                logging.getLogger(__name__).warning(f"⚠️ Could not import {module}: {str(e)}")
+
+
+with startup_report.step("create dirs"):
+    Config.create_dirs()  # Create folders on boot
+
+if Config.WARM_UP_HANDLERS:
+    # Heavy stacks one step each, so the report shows which dominates before the indexes load
+    _timed_import("import langchain/FAISS", "faiss", "langchain_community.vectorstores")
+    _timed_import("import embedding stack", "langchain_huggingface")
+    _timed_import("import handlers", "services.handler_factory")
+    for category in Config.CATEGORIES:
+        with startup_report.step(f"warm up {category}"):
+            HandlerRegistry.warm_up([category])  # Load handler and vector index before the first request
+
+startup_report.mark_ready()
+startup_report.log(logging.getLogger(__name__))
+
+
+def _invalid_category_map(data):
+    """Error response for a malformed {category: [image paths]} body, or None if it is valid"""
+    if not data or not isinstance(data, dict):
+        return jsonify({
+            "error": "Invalid request format. Expected JSON with categories and photo paths.",
+            "expected_format": {
+                "category_name": ["image1.jpg", "image2.jpg"]
+            }
+        }), 400
+
+    for category, image_paths in data.items():
+        if not isinstance(image_paths, list) or not image_paths:
+            return jsonify({
+                "error": f"Invalid format for category '{category}'. Expected non-empty list of image paths."
+            }), 400
+
+    return None
+
+
+def _use_cache():
+    """False when the request asks for fresh model calls with ?bypass_cache=true"""
+    return request.args.get("bypass_cache", "").lower() not in ("1", "true", "yes")
+
+
+def _tables_payload(data, results):
+    """Response body shared by /api/analyze_with_tables and finished jobs"""
+    return {
+        "success": True,
+        "compliance_tables": results["compliance_tables"],
+        "processing_summary": results["processing_summary"],
+        "errors": results["errors"],
+        "metadata": {
+            "total_categories": len(data),
+            "total_images": sum(len(paths) for paths in data.values()),
+            "categories_processed": list(results["compliance_tables"].keys())
+        }
+    }
+
+
+def _basic_payload(orchestrator, results):
+    """Response body shared by /api/analyze_basic and its streaming variant"""
+    return {
+        "success": True,
+        "results": results,
+        "summary": orchestrator.get_summary(results)
+    }
+
+
+def _sse_response(orchestrator, generate_tables):
+    """
+    Stream orchestrator events as server-sent events. The final "done" event carries
+    the same body the non-streaming endpoint would have returned.
+    """
+    def events():
+        for event in orchestrator.stream(generate_tables=generate_tables):
+            name = event.pop("event")
+            if name == "done":
+                results = event["results"]
+                event = _tables_payload(orchestrator.category_map, results) if generate_tables \
+                    else _basic_payload(orchestrator, results)
+            yield f"event: {name}\ndata: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _run_tables_job(data, job, use_cache=True):
+    orchestrator = SimpleComplianceOrchestrator(data, progress_callback=job.record_progress, use_cache=use_cache)
+    return _tables_payload(data, orchestrator.run_with_tables())
+
 
 @app.route("/api/simple_analyze", methods=["POST"])
 def simple_analyze():
@@ -64,7 +176,7 @@ def simple_analyze():
                     }), 400
 
         # Initialize orchestrator
-        orchestrator = SimpleComplianceOrchestrator(data)
+        orchestrator = SimpleComplianceOrchestrator(data, use_cache=_use_cache())
 
         if generate_tables:
             # Generate compliance tables (new functionality)
@@ -111,45 +223,158 @@ def analyze_with_tables():
     try:
         data = request.get_json()
 
-        if not data or not isinstance(data, dict):
-            return jsonify({
-                "error": "Invalid request format. Expected JSON with categories and photo paths.",
-                "expected_format": {
-                    "category_name": ["image1.jpg", "image2.jpg"]
-                }
-            }), 400
-
-        # Validate category data structure
-        for category, image_paths in data.items():
-            if not isinstance(image_paths, list) or not image_paths:
-                return jsonify({
-                    "error": f"Invalid format for category '{category}'. Expected non-empty list of image paths."
-                }), 400
+        invalid = _invalid_category_map(data)
+        if invalid:
+            return invalid
 
         # Initialize orchestrator and generate tables
-        orchestrator = SimpleComplianceOrchestrator(data)
+        orchestrator = SimpleComplianceOrchestrator(data, use_cache=_use_cache())
         results = orchestrator.run_with_tables()
 
+        return jsonify(_tables_payload(data, results))
+
+    except Exception as e:
+        app.logger.error(f"Error in analyze_with_tables endpoint: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": f"Internal server error: {str(e)}"
+        }), 500
+
+
+@app.route("/api/simple_analyze/stream", methods=["POST"])
+def simple_analyze_stream():
+    """
+    Server-sent events variant of /api/simple_analyze
+
+    Events: "image" per finished image, "table_token" and "table" per category when
+    generate_tables is true, then "done" with the full response body.
+    """
+    try:
+        data = request.get_json(silent=True)
+        generate_tables = data.pop("generate_tables", True) if isinstance(data, dict) else True
+
+        invalid = _invalid_category_map(data)
+        if invalid:
+            return invalid
+
+        return _sse_response(SimpleComplianceOrchestrator(data, use_cache=_use_cache()), generate_tables)
+
+    except Exception as e:
+        app.logger.error(f"Error in simple_analyze_stream endpoint: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": f"Internal server error: {str(e)}"
+        }), 500
+
+
+@app.route("/api/analyze_with_tables/stream", methods=["POST"])
+def analyze_with_tables_stream():
+    """
+    Server-sent events variant of /api/analyze_with_tables
+
+    Events: "image" per finished image, "table_token" while a category's table is
+    generated, "table" per category, then "done" with the full response body.
+    """
+    try:
+        data = request.get_json(silent=True)
+
+        invalid = _invalid_category_map(data)
+        if invalid:
+            return invalid
+
+        return _sse_response(SimpleComplianceOrchestrator(data, use_cache=_use_cache()), generate_tables=True)
+
+    except Exception as e:
+        app.logger.error(f"Error in analyze_with_tables_stream endpoint: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": f"Internal server error: {str(e)}"
+        }), 500
+
+
+@app.route("/api/jobs", methods=["POST"])
+def submit_job():
+    """
+    Queue an analyze_with_tables run in the background and return its job ID immediately
+
+    Expected JSON format: same as /api/analyze_with_tables
+    """
+    try:
+        data = request.get_json(silent=True)
+
+        invalid = _invalid_category_map(data)
+        if invalid:
+            return invalid
+
+        use_cache = _use_cache()
+        job = get_job_manager().submit(data, lambda category_map, job: _run_tables_job(category_map, job, use_cache))
+
         return jsonify({
             "success": True,
-            "compliance_tables": results["compliance_tables"],
-            "processing_summary": results["processing_summary"],
-            "errors": results["errors"],
-            "metadata": {
-                "total_categories": len(data),
-                "total_images": sum(len(paths) for paths in data.values()),
-                "categories_processed": list(results["compliance_tables"].keys())
-            }
-        })
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": f"/api/jobs/{job.id}",
+            "result_url": f"/api/jobs/{job.id}/result"
+        }), 202
+
+    except JobQueueFullError as e:
+        return jsonify({
+            "success": False,
+            "error": str(e)
+        }), 429
 
     except Exception as e:
-        app.logger.error(f"Error in analyze_with_tables endpoint: {str(e)}")
+        app.logger.error(f"Error in submit_job endpoint: {str(e)}")
         return jsonify({
             "success": False,
             "error": f"Internal server error: {str(e)}"
         }), 500
 
 
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """Status and per-image progress of a background job"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({
+            "success": False,
+            "error": f"Unknown or expired job: {job_id}"
+        }), 404
+
+    return jsonify({
+        "success": True,
+        **job.to_dict()
+    })
+
+
+@app.route("/api/jobs/<job_id>/result", methods=["GET"])
+def job_result(job_id):
+    """Result of a finished job; 202 while it is still queued or running"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        return jsonify({
+            "success": False,
+            "error": f"Unknown or expired job: {job_id}"
+        }), 404
+
+    if job.status == "completed":
+        return jsonify(job.result)
+
+    if job.status == "failed":
+        return jsonify({
+            "success": False,
+            "job_id": job.id,
+            "error": f"Job failed: {job.error}"
+        }), 500
+
+    return jsonify({
+        "success": False,
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": f"/api/jobs/{job.id}"
+    }), 202
+
+
 @app.route("/api/analyze_basic", methods=["POST"])
 def analyze_basic():
     """
@@ -177,18 +402,106 @@ def analyze_basic():
                 }), 400
 
         # Initialize orchestrator and run basic analysis
-        orchestrator = SimpleComplianceOrchestrator(data)
+        orchestrator = SimpleComplianceOrchestrator(data, use_cache=_use_cache())
         results = orchestrator.run()
-        summary = orchestrator.get_summary(results)
+
+        return jsonify(_basic_payload(orchestrator, results))
+
+    except Exception as e:
+        app.logger.error(f"Error in analyze_basic endpoint: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": f"Internal server error: {str(e)}"
+        }), 500
+
+
+@app.route("/api/analyze_basic/stream", methods=["POST"])
+def analyze_basic_stream():
+    """
+    Server-sent events variant of /api/analyze_basic
+
+    Events: "image" per finished image, then "done" with the full response body.
+    """
+    try:
+        data = request.get_json(silent=True)
+
+        invalid = _invalid_category_map(data)
+        if invalid:
+            return invalid
+
+        return _sse_response(SimpleComplianceOrchestrator(data, use_cache=_use_cache()), generate_tables=False)
+
+    except Exception as e:
+        app.logger.error(f"Error in analyze_basic_stream endpoint: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": f"Internal server error: {str(e)}"
+        }), 500
+
+
+@app.route("/api/usage", methods=["GET"])
+def usage():
+    """Per-key and per-model OpenRouter usage since the process started"""
+    try:
+        from utils.llm_models_utils import get_usage_report
 
         return jsonify({
             "success": True,
-            "results": results,
-            "summary": summary
+            "usage": get_usage_report()
         })
 
     except Exception as e:
-        app.logger.error(f"Error in analyze_basic endpoint: {str(e)}")
+        app.logger.error(f"Error in usage endpoint: {str(e)}")
+        return jsonify({
+            "success": False,
+            "error": f"Internal server error: {str(e)}"
+        }), 500
+
+
+@app.route("/health", methods=["GET"])
+def health():
+    """Liveness check with the startup-time report; does not load handlers or models"""
+    return jsonify({
+        "status": "ok",
+        "startup": startup_report.as_dict(),
+        "loaded_categories": HandlerRegistry.loaded_categories()
+    })
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Stage timings, OpenRouter request and token counters in the Prometheus text format"""
+    return Response(render_prometheus(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/api/reload_handlers", methods=["POST"])
+def reload_handlers():
+    """
+    Reload category handlers and their vector indexes, e.g. after rebuilding vector stores
+
+    Expected JSON format (optional):
+    {
+        "category": "electricity"  // omit to reload every loaded category (all categories if none is loaded)
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        category = data.get("category")
+
+        if category is not None and category not in Config.CATEGORIES:
+            return jsonify({
+                "error": f"Unsupported category: {category}"
+            }), 400
+
+        status = HandlerRegistry.reload(category)
+
+        return jsonify({
+            "success": bool(status) and all(value == "reloaded" for value in status.values()),
+            "status": status
+        })
+
+    except Exception as e:
+        app.logger.error(f"Error in reload_handlers endpoint: {str(e)}")
         return jsonify({
             "success": False,
             "error": f"Internal server error: {str(e)}"
@@ -1,27 +1,34 @@
 import os
+import json
 from dotenv import load_dotenv
 from typing import List
 
 load_dotenv()
 
 
+def _env_list(name: str) -> List[str]:
+    """Comma-separated env var as a list, ignoring blanks"""
+    return [item.strip() for item in os.getenv(name, "").split(",") if item.strip()]
+
+
 class Config:
     # API Keys
-    OPENROUTER_API_KEYS: List[str] = os.getenv("OPENROUTER_API_KEYS", "").split(",")
+    OPENROUTER_API_KEYS: List[str] = _env_list("OPENROUTER_API_KEYS")
 
     # Embedding Model
     EMBEDDING_MODEL_PATH = os.getenv("EMBEDDING_MODEL_PATH", "sentence-transformers/all-MiniLM-L6-v2")
 
     # Vision/Text Model Preferences
-    VISION_MODELS: List[str] = os.getenv("VISION_MODELS", "").split(",")
-    TEXT_MODELS: List[str] = os.getenv("TEXT_MODELS", "").split(",")
-    THERMAL_VISION_MODELS: List[str] = os.getenv("THERMAL_VISION_MODELS", "").split(",")
+    VISION_MODELS: List[str] = _env_list("VISION_MODELS")
+    TEXT_MODELS: List[str] = _env_list("TEXT_MODELS")
+    THERMAL_VISION_MODELS: List[str] = _env_list("THERMAL_VISION_MODELS")
 
     # Directories
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     CODES_DIR = os.path.join(BASE_DIR, "data", "saudi_codes")
     DB_DIR = os.path.join(BASE_DIR, "data", "db")
     UPLOADS_DIR = os.path.join(BASE_DIR, "data", "uploads")
+    CACHE_DIR = os.path.join(BASE_DIR, "data", "cache")
 
     # Categories Supported
     CATEGORIES = ["electricity", "plumbing"]
@@ -30,8 +37,105 @@ class Config:
     MAX_TOKENS_VISION = 3000
     MAX_TOKENS_TEXT = 10000
 
+    # OpenRouter transport
+    OPENROUTER_API_URL = os.getenv("OPENROUTER_API_URL", "https://openrouter.ai/api/v1/chat/completions")
+    HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+    HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "120"))
+    HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "32"))
+    HTTP_ASYNC_MAX_CONNECTIONS = int(os.getenv("HTTP_ASYNC_MAX_CONNECTIONS", "200"))
+
+    # Key rotation: per-key token bucket (requests per second, burst size)
+    OPENROUTER_KEY_RATE = float(os.getenv("OPENROUTER_KEY_RATE", "2"))
+    OPENROUTER_KEY_BURST = int(os.getenv("OPENROUTER_KEY_BURST", "10"))
+
+    # Adaptive (AIMD) limit on OpenRouter requests in flight across all keys
+    OPENROUTER_ADAPTIVE_CONCURRENCY = os.getenv("OPENROUTER_ADAPTIVE_CONCURRENCY", "true").lower() == "true"
+    OPENROUTER_CONCURRENCY_INITIAL = int(os.getenv("OPENROUTER_CONCURRENCY_INITIAL", "8"))
+    OPENROUTER_CONCURRENCY_MIN = int(os.getenv("OPENROUTER_CONCURRENCY_MIN", "1"))
+    OPENROUTER_CONCURRENCY_MAX = int(os.getenv("OPENROUTER_CONCURRENCY_MAX", "64"))
+
+    # Retries per model on 429/5xx/transport errors (jittered backoff; a longer Retry-After fails over instead)
+    OPENROUTER_MAX_RETRIES = int(os.getenv("OPENROUTER_MAX_RETRIES", "2"))
+    OPENROUTER_RETRY_BASE_SECONDS = float(os.getenv("OPENROUTER_RETRY_BASE_SECONDS", "0.5"))
+    OPENROUTER_RETRY_MAX_SECONDS = float(os.getenv("OPENROUTER_RETRY_MAX_SECONDS", "10"))
+
+    # Per key/model circuit breaker: consecutive failures before failing fast, and seconds until a probe
+    CIRCUIT_BREAKER_FAILURES = int(os.getenv("CIRCUIT_BREAKER_FAILURES", "5"))
+    CIRCUIT_BREAKER_RESET_SECONDS = float(os.getenv("CIRCUIT_BREAKER_RESET_SECONDS", "30"))
+
+    # Table generation: estimated prompt tokens before switching to map-reduce, map batch size and parallelism
+    TABLE_PROMPT_TOKEN_BUDGET = int(os.getenv("TABLE_PROMPT_TOKEN_BUDGET", "12000"))
+    TABLE_MAP_BATCH_TOKENS = int(os.getenv("TABLE_MAP_BATCH_TOKENS", "6000"))
+    TABLE_MAP_WORKERS = int(os.getenv("TABLE_MAP_WORKERS", "4"))
+
+    # Single-pass vision: validate and describe each image with one request
+    COMBINED_VISION_MODE = os.getenv("COMBINED_VISION_MODE", "false").lower() == "true"
+    # Decide validity by matching validation keywords (legacy semantics) rather than the model's verdict
+    COMBINED_VISION_KEYWORD_VALIDATION = os.getenv("COMBINED_VISION_KEYWORD_VALIDATION", "true").lower() == "true"
+
+    # Vision response cache (keyed by image content hash + prompt + model)
+    VISION_CACHE_ENABLED = os.getenv("VISION_CACHE_ENABLED", "true").lower() == "true"
+    VISION_CACHE_MAX_ENTRIES = int(os.getenv("VISION_CACHE_MAX_ENTRIES", "5000"))
+    VISION_CACHE_TTL_SECONDS = float(os.getenv("VISION_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+    # Text model response cache (keyed by full prompt hash + model + max_tokens); errors are never cached
+    TEXT_CACHE_ENABLED = os.getenv("TEXT_CACHE_ENABLED", "true").lower() == "true"
+    TEXT_CACHE_MAX_ENTRIES = int(os.getenv("TEXT_CACHE_MAX_ENTRIES", "20000"))
+    TEXT_CACHE_TTL_SECONDS = float(os.getenv("TEXT_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+
+    # Share one in-flight request between concurrent identical vision/text calls
+    SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+    # Image preprocessing before vision upload
+    IMAGE_PREPROCESSING_ENABLED = os.getenv("IMAGE_PREPROCESSING_ENABLED", "true").lower() == "true"
+    IMAGE_MAX_DIMENSION = int(os.getenv("IMAGE_MAX_DIMENSION", "1568"))
+    IMAGE_FORMAT = os.getenv("IMAGE_FORMAT", "JPEG")
+    IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "85"))
+    IMAGE_PREPROCESS_CACHE_SIZE = int(os.getenv("IMAGE_PREPROCESS_CACHE_SIZE", "256"))
+
+    # Persistent cache of document embeddings (keyed by model + text hash), shared by builder processes;
+    # query embeddings are only cached in memory
+    EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+
+    # Vector store ingestion: process-pool sizes for PDF parsing/chunking and for categories (1 = serial)
+    INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "1"))
+    INGEST_CATEGORY_WORKERS = int(os.getenv("INGEST_CATEGORY_WORKERS", "1"))
+
+    # Vector index type built by VectorStoreBuilder: flat, ivf, hnsw, pq or ivfpq
+    INDEX_TYPE = os.getenv("INDEX_TYPE", "flat")
+    # JSON overrides for the index build/search parameters, e.g. {"nlist": 64, "search": {"nprobe": 8}}
+    INDEX_PARAMS = json.loads(os.getenv("INDEX_PARAMS", "{}"))
+
+    # In-process LRU of RAGEngine.query/mmr_query results (0 disables) and how often to check for a rebuilt index
+    RAG_QUERY_CACHE_SIZE = int(os.getenv("RAG_QUERY_CACHE_SIZE", "1024"))
+    RAG_INDEX_CHECK_SECONDS = float(os.getenv("RAG_INDEX_CHECK_SECONDS", "5"))
+
+    # Retrieved code excerpts injected into the compliance prompt (0 disables) and the near-duplicate cut-off
+    RAG_CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKEN_BUDGET", "1500"))
+    RAG_CONTEXT_DUPLICATE_THRESHOLD = float(os.getenv("RAG_CONTEXT_DUPLICATE_THRESHOLD", "0.8"))
+
+    # Opt-in: load every category's handler and index when the app starts instead of on first use
+    WARM_UP_HANDLERS = os.getenv("WARM_UP_HANDLERS", "false").lower() == "true"
+
+    # Orchestrator concurrency
+    ORCHESTRATOR_CONCURRENT = os.getenv("ORCHESTRATOR_CONCURRENT", "false").lower() == "true"
+    MAX_IMAGE_WORKERS = int(os.getenv("MAX_IMAGE_WORKERS", "8"))
+    MAX_CATEGORY_WORKERS = int(os.getenv("MAX_CATEGORY_WORKERS", "2"))
+
+    # Opt-in: analyze near-duplicate photos in a category (difference-hash bits apart, out of 64) once.
+    # Trade-off: saves vision/text calls on bursts of the same shot, but similar-looking different
+    # fixtures (two panels, two outlets) can be merged and only the first one's findings reach the
+    # table. Re-saved or resized copies of one photo are usually within 3 bits; keep the threshold low.
+    IMAGE_DEDUP_ENABLED = os.getenv("IMAGE_DEDUP_ENABLED", "false").lower() == "true"
+    IMAGE_DEDUP_HAMMING_THRESHOLD = int(os.getenv("IMAGE_DEDUP_HAMMING_THRESHOLD", "3"))
+
+    # Background analysis jobs: jobs run at once, jobs allowed to wait, and how long finished jobs are kept
+    JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+    JOB_MAX_PENDING = int(os.getenv("JOB_MAX_PENDING", "20"))
+    JOB_RESULT_TTL_SECONDS = float(os.getenv("JOB_RESULT_TTL_SECONDS", "3600"))
+
     @classmethod
     def create_dirs(cls):
         """Ensure required directories exist."""
-        for path in [cls.CODES_DIR, cls.DB_DIR, cls.UPLOADS_DIR]:
+        for path in [cls.CODES_DIR, cls.DB_DIR, cls.UPLOADS_DIR, cls.CACHE_DIR]:
             os.makedirs(path, exist_ok=True)
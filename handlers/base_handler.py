@@ -1,14 +1,29 @@
 from abc import ABC, abstractmethod
-from typing import Dict, List, Any
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, List, Any, Optional, Tuple
 import json
+import logging
+from config import Config
 from llm.llm_text_model import LLMTextModel
+from services.context_assembler import assemble_context
 from services.image_analyzer import ImageAnalyzer
-from services.image_validator import validate_image
+from services.image_validator import validate_image, matches_keywords
+from utils.metrics import span
+from utils.token_budget import estimate_tokens, pack_batches
+
+# Summarize-and-retry rounds before the table prompt is sent over budget anyway
+TABLE_MAP_MAX_LEVELS = 3
 
 
 class BaseHandler(ABC):
     """Base class for all category handlers with table generation capability"""
 
+    # Validate and describe each image with a single vision call
+    use_combined_vision: bool = Config.COMBINED_VISION_MODE
+    # In combined mode, decide validity with validation_keywords instead of the model's verdict
+    keyword_validation: bool = Config.COMBINED_VISION_KEYWORD_VALIDATION
+
     def __init__(self, category_name: str):
         self.category_name = category_name
         self.rag_engine = None
@@ -55,8 +70,58 @@ class BaseHandler(ABC):
         """List of items/checkpoints for this category"""
         pass
 
+    @property
+    def combined_vision_prompt(self) -> str:
+        """Prompt for validating and describing the image in one request"""
+        return f"""
+        Answer both requests below about this image.
+
+        Request 1 (verification):
+        {self.validation_prompt.strip()}
+
+        Request 2 (description):
+        {self.vision_analysis_prompt.strip()}
+
+        Respond with a single JSON object and nothing else:
+        {{
+            "validation_notes": "Your answer to request 1",
+            "is_valid": true,
+            "reason": "Why the image is or is not suitable for the {self.category_name} category",
+            "description": "Your answer to request 2"
+        }}
+        """
+
+    def inspect_image(self, image_path: str) -> Dict:
+        """Validate and describe the image with a single vision call"""
+        try:
+            inspection = ImageAnalyzer.inspect(image_path, self.combined_vision_prompt)
+
+            if self.keyword_validation or inspection["is_valid"] is None:
+                is_valid = matches_keywords(inspection["validation_notes"], self.validation_keywords)
+            else:
+                is_valid = inspection["is_valid"]
+
+            # The model's reason explains its own verdict, so it is only a rejection reason when
+            # the model rejected the image (not when the keyword check overruled a "valid")
+            model_reason = (inspection.get("reason") or "").strip() if inspection["is_valid"] is False else ""
+            reason = "" if is_valid else (
+                model_reason or f"The image is not suitable for the '{self.category_name}' category."
+            )
+            result = {"is_valid": is_valid, "reason": reason}
+            if is_valid and inspection["description"]:
+                result["description"] = inspection["description"]
+            return result
+        except Exception as e:
+            return {
+                "is_valid": False,
+                "reason": f"Image validation error: {str(e)}"
+            }
+
     def validate_image(self, image_path: str) -> Dict:
         """Validate if image is appropriate for this category"""
+        if self.use_combined_vision:
+            return self.inspect_image(image_path)
+
         try:
             is_valid = validate_image(
                 image_path,
@@ -86,11 +151,27 @@ class BaseHandler(ABC):
                 "error": str(e)
             }
 
+    def _compliance_prompt_with_context(self, context: str) -> str:
+        """Compliance prompt grounded in the retrieved code excerpts"""
+        if not context:
+            return self.compliance_analysis_prompt
+        return f"""{self.compliance_analysis_prompt.rstrip()}
+
+        Relevant Saudi code excerpts (source and page in brackets):
+        {context}
+
+        Base the analysis on these excerpts where they apply and cite the source and page of each requirement you use.
+        """
+
     def get_compliance_analysis(self, description: str) -> Dict:
         """Get compliance analysis for a single image"""
         try:
-            matches = self.rag_engine.query(description)
-            compliance_analysis = LLMTextModel.analyze(description, self.compliance_analysis_prompt)
+            with span("retrieval", category=self.category_name):
+                matches = self.rag_engine.query(description)
+            with span("context_assembly", category=self.category_name):
+                prompt = self._compliance_prompt_with_context(assemble_context(matches))
+            with span("compliance_llm", category=self.category_name):
+                compliance_analysis = LLMTextModel.analyze(description, prompt)
 
             return {
                 "description": description,
@@ -104,6 +185,121 @@ class BaseHandler(ABC):
                 "error": str(e)
             }
 
+    @property
+    def checkpoint_summary_prompt(self) -> str:
+        """Map step of hierarchical table generation: condense a batch of analyses per checkpoint"""
+        return """
+        You are reviewing compliance analyses of images from the {category_name} category.
+        Condense the analyses below into findings per checkpoint. Checkpoints: {category_items}
+
+        For every checkpoint the analyses mention, write one block:
+        Checkpoint: <checkpoint name>
+        Observations: <what was seen, citing image numbers>
+        Issues: <violations found, or "None">
+        Positives: <what complies with the code>
+
+        Skip checkpoints that are not mentioned. Keep every concrete observation, violation and
+        measurement, drop repetition, and do not invent findings. Answer in plain text.
+
+        Analyses:
+        {analyses_text}
+        """
+
+    def _summarize_batch(self, entries: List[str]) -> str:
+        prompt = self.checkpoint_summary_prompt.format(
+            category_name=self.category_name,
+            category_items=", ".join(self.category_items),
+            analyses_text="\n\n---\n\n".join(entries)
+        )
+        summary = LLMTextModel.analyze("", prompt)
+        if summary.startswith("⚠️"):
+            # Keep the source text rather than losing the batch's findings
+            logging.getLogger(__name__).warning(f"Checkpoint summary failed for '{self.category_name}': {summary}")
+            return "\n\n---\n\n".join(entries)
+        return summary
+
+    def _condense_analyses(self, entries: List[str]) -> str:
+        """
+        Map-reduce for large inspections: while the table prompt would exceed
+        TABLE_PROMPT_TOKEN_BUDGET, summarize token-budgeted batches of entries into
+        per-checkpoint findings (in parallel) and repeat on the summaries.
+        """
+        overhead = estimate_tokens(self.table_generation_prompt)
+        previous_tokens = None
+        for level in range(TABLE_MAP_MAX_LEVELS + 1):
+            analyses_text = "\n\n---\n\n".join(entries)
+            tokens = estimate_tokens(analyses_text)
+            if len(entries) == 1 or overhead + tokens <= Config.TABLE_PROMPT_TOKEN_BUDGET:
+                return analyses_text
+            if previous_tokens is not None and tokens >= previous_tokens:
+                # Summaries failed and fell back to their sources; another round would resend the same text
+                logging.getLogger(__name__).warning(
+                    f"Condensing analyses for '{self.category_name}' made no progress at level {level}, stopping"
+                )
+                return analyses_text
+            if level == TABLE_MAP_MAX_LEVELS:
+                break
+            previous_tokens = tokens
+
+            batches = [[entries[i] for i in batch] for batch in pack_batches(entries, Config.TABLE_MAP_BATCH_TOKENS)]
+            logging.getLogger(__name__).info(
+                f"Condensing {len(entries)} analyses for '{self.category_name}' in {len(batches)} batches (level {level + 1})"
+            )
+            workers = max(1, min(Config.TABLE_MAP_WORKERS, len(batches)))
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="table-map") as executor:
+                # Copied contexts carry per-request settings such as response cache bypass
+                futures = [executor.submit(contextvars.copy_context().run, self._summarize_batch, batch)
+                           for batch in batches]
+                summaries = [future.result() for future in futures]
+            entries = [f"Findings group {i + 1}:\n{summary.strip()}" for i, summary in enumerate(summaries)]
+
+        logging.getLogger(__name__).warning(
+            f"Table prompt for '{self.category_name}' still exceeds the token budget after {TABLE_MAP_MAX_LEVELS} levels"
+        )
+        return analyses_text
+
+    def _build_table_prompt(self, all_compliance_analyses: List[Dict]) -> Optional[str]:
+        """Full table generation prompt, or None if there is nothing to tabulate"""
+        entries = [
+            f"Image Analysis {i + 1}:\nDescription: {analysis['description']}\nCompliance Analysis: {analysis['compliance_analysis']}"
+            for i, analysis in enumerate(
+                analysis for analysis in all_compliance_analyses
+                if not analysis.get("skipped", False) and "compliance_analysis" in analysis
+            )
+        ]
+        if not entries:
+            return None
+
+        return self.table_generation_prompt.format(
+            category_name=self.category_name,
+            category_items=", ".join(self.category_items),
+            analyses_text=self._condense_analyses(entries)
+        )
+
+    @staticmethod
+    def _is_json(text: str) -> bool:
+        """Only table responses that parse are worth caching; a broken one should be regenerated"""
+        try:
+            json.loads(text)
+            return True
+        except json.JSONDecodeError:
+            return False
+
+    def _parse_table_response(self, json_response: str) -> Dict[str, Any]:
+        # Try to parse as JSON, fallback if needed
+        try:
+            return json.loads(json_response)
+        except json.JSONDecodeError:
+            # If LLM didn't return valid JSON, create a fallback structure
+            return {
+                "category": self.category_name,
+                "items": [],
+                "overall_compliance_percentage": 0,
+                "category_advantages": [],
+                "raw_response": json_response,
+                "error": "Failed to parse LLM response as JSON"
+            }
+
     def generate_compliance_table(self, all_compliance_analyses: List[Dict]) -> Dict[str, Any]:
         """
         Generate a compliance table JSON for the entire category
@@ -115,56 +311,46 @@ class BaseHandler(ABC):
             JSON structure that frontend can use to generate the table
         """
         try:
-            # Combine all compliance analyses
-            combined_analyses = []
-            for analysis in all_compliance_analyses:
-                if not analysis.get("skipped", False) and "compliance_analysis" in analysis:
-                    combined_analyses.append({
-                        "description": analysis["description"],
-                        "compliance_analysis": analysis["compliance_analysis"],
-                        "code_matches": analysis.get("code_matches", [])
-                    })
-
-            if not combined_analyses:
+            full_prompt = self._build_table_prompt(all_compliance_analyses)
+            if full_prompt is None:
                 return {
                     "error": "No valid compliance analyses available for table generation",
                     "category": self.category_name
                 }
 
-            # Create the prompt with all analyses
-            analyses_text = "\n\n---\n\n".join([
-                f"Image Analysis {i + 1}:\nDescription: {analysis['description']}\nCompliance Analysis: {analysis['compliance_analysis']}"
-                for i, analysis in enumerate(combined_analyses)
-            ])
+            # Get JSON response from LLM; the analyses are already part of the prompt
+            json_response = LLMTextModel.analyze("", full_prompt, cacheable=self._is_json)
+            return self._parse_table_response(json_response)
 
-            full_prompt = self.table_generation_prompt.format(
-                category_name=self.category_name,
-                category_items=", ".join(self.category_items),
-                analyses_text=analyses_text
-            )
+        except Exception as e:
+            return {
+                "error": f"Table generation error: {str(e)}",
+                "category": self.category_name
+            }
 
-            # Get JSON response from LLM
-            json_response = LLMTextModel.analyze(analyses_text, full_prompt)
-
-            # Try to parse as JSON, fallback if needed
-            try:
-                table_data = json.loads(json_response)
-            except json.JSONDecodeError:
-                # If LLM didn't return valid JSON, create a fallback structure
-                table_data = {
-                    "category": self.category_name,
-                    "items": [],
-                    "overall_compliance_percentage": 0,
-                    "category_advantages": [],
-                    "raw_response": json_response,
-                    "error": "Failed to parse LLM response as JSON"
+    def generate_compliance_table_stream(self, all_compliance_analyses: List[Dict]) -> Iterator[Tuple[str, Any]]:
+        """
+        Streaming variant of generate_compliance_table. Yields ("token", text) as the LLM
+        writes the table, then exactly one ("table", table_data).
+        """
+        try:
+            full_prompt = self._build_table_prompt(all_compliance_analyses)
+            if full_prompt is None:
+                yield "table", {
+                    "error": "No valid compliance analyses available for table generation",
+                    "category": self.category_name
                 }
+                return
 
-            return table_data
+            chunks = []
+            for chunk in LLMTextModel.analyze_stream("", full_prompt, cacheable=self._is_json):
+                chunks.append(chunk)
+                yield "token", chunk
+
+            yield "table", self._parse_table_response("".join(chunks).strip())
 
         except Exception as e:
-            return {
+            yield "table", {
                 "error": f"Table generation error: {str(e)}",
                 "category": self.category_name
             }
-
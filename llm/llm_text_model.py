@@ -1,6 +1,18 @@
-from utils.llm_models_utils import call_text_model
+from typing import Callable, Iterator, Optional
+from utils.llm_models_utils import call_text_model, call_text_model_async, call_text_model_stream
 
 class LLMTextModel:
     @staticmethod
-    def analyze(description: str, compliance_prompt: str) -> str:
-        return call_text_model(description, compliance_prompt)
+    def analyze(description: str, compliance_prompt: str, use_cache: bool = True,
+                cacheable: Optional[Callable[[str], bool]] = None) -> str:
+        return call_text_model(description, compliance_prompt, use_cache=use_cache, cacheable=cacheable)
+
+    @staticmethod
+    async def analyze_async(description: str, compliance_prompt: str, use_cache: bool = True,
+                            cacheable: Optional[Callable[[str], bool]] = None) -> str:
+        return await call_text_model_async(description, compliance_prompt, use_cache=use_cache, cacheable=cacheable)
+
+    @staticmethod
+    def analyze_stream(description: str, compliance_prompt: str, use_cache: bool = True,
+                       cacheable: Optional[Callable[[str], bool]] = None) -> Iterator[str]:
+        return call_text_model_stream(description, compliance_prompt, use_cache=use_cache, cacheable=cacheable)
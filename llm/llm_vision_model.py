@@ -1,6 +1,10 @@
-from utils.llm_models_utils import call_vision_model
+from utils.llm_models_utils import call_vision_model, call_vision_model_async
 
 class VisionModel:
     @staticmethod
     def describe(image_path: str, prompt: str) -> str:
-        return call_vision_model(image_path, prompt)
\ No newline at end of file
+        return call_vision_model(image_path, prompt)
+
+    @staticmethod
+    async def describe_async(image_path: str, prompt: str) -> str:
+        return await call_vision_model_async(image_path, prompt)
\ No newline at end of file
@@ -0,0 +1,115 @@
+# scripts/benchmark_ann.py
+"""
+Compare FAISS index types on recall@k against the exact flat index, queries per second
+and bytes per vector.
+
+    python -m scripts.benchmark_ann --category electricity
+    python -m scripts.benchmark_ann --synthetic 50000 --dimension 384 --json results.json
+"""
+import os
+import json
+import time
+import argparse
+from typing import Dict, List
+import faiss
+import numpy as np
+from config import Config
+from services.ann_index import INDEX_TYPES, build_index, bytes_per_vector
+
+
+def load_category_vectors(category: str) -> np.ndarray:
+    """All vectors of a built category store, whatever its on-disk format"""
+    index = faiss.read_index(os.path.join(Config.DB_DIR, category, "index.faiss"))
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def synthetic_vectors(count: int, dimension: int, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors, closer to real embedding distributions than uniform noise"""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, count // 100), dimension)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), size=count)]
+    vectors += 0.3 * rng.normal(size=vectors.shape).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def make_queries(vectors: np.ndarray, count: int, seed: int = 1) -> np.ndarray:
+    """Perturbed copies of stored vectors, so each query has meaningful neighbours"""
+    rng = np.random.default_rng(seed)
+    queries = vectors[rng.integers(0, len(vectors), size=count)].copy()
+    queries += 0.05 * rng.normal(size=queries.shape).astype(np.float32)
+    faiss.normalize_L2(queries)
+    return queries
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(row[row >= 0]) & set(expected)) for row, expected in zip(found, truth))
+    return hits / truth.size
+
+
+def run_benchmark(vectors: np.ndarray, queries: np.ndarray, k: int, index_types: List[str],
+                  params: Dict[str, Dict]) -> List[Dict]:
+    baseline = faiss.IndexFlatL2(vectors.shape[1])
+    baseline.add(vectors)
+    _, truth = baseline.search(queries, k)
+
+    results = []
+    for index_type in index_types:
+        started = time.perf_counter()
+        index, config = build_index(vectors, index_type, faiss.METRIC_L2, params.get(index_type))
+        build_seconds = time.perf_counter() - started
+
+        # One-query-at-a-time latency is what RAGEngine.query sees
+        started = time.perf_counter()
+        found = np.vstack([index.search(queries[i:i + 1], k)[1] for i in range(len(queries))])
+        elapsed = time.perf_counter() - started
+
+        results.append({
+            "index_type": index_type,
+            "params": config["params"],
+            f"recall@{k}": round(recall_at_k(found, truth), 4),
+            "qps": round(len(queries) / elapsed, 1),
+            "bytes_per_vector": round(bytes_per_vector(index), 1),
+            "build_seconds": round(build_seconds, 3)
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall/latency benchmark for FAISS index types")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--category", help="Benchmark the vectors of a built category store")
+    source.add_argument("--synthetic", type=int, default=20000, help="Number of synthetic vectors")
+    parser.add_argument("--dimension", type=int, default=384, help="Synthetic vector dimension")
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--types", default=",".join(INDEX_TYPES), help="Comma-separated index types")
+    parser.add_argument("--params", type=json.loads, default={},
+                        help='Per-type overrides, e.g. \'{"ivf": {"nlist": 64, "search": {"nprobe": 8}}}\'')
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file")
+    args = parser.parse_args()
+
+    if args.category:
+        vectors = load_category_vectors(args.category)
+        corpus = f"category '{args.category}'"
+    else:
+        vectors = synthetic_vectors(args.synthetic, args.dimension)
+        corpus = f"{args.synthetic} synthetic vectors"
+
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    queries = make_queries(vectors, args.queries)
+    results = run_benchmark(vectors, queries, args.k, args.types.split(","), args.params)
+
+    print(f"Corpus: {corpus} ({len(vectors)} x {vectors.shape[1]}), {len(queries)} queries, k={args.k}\n")
+    print(f"{'index':<8} {'recall@' + str(args.k):>10} {'QPS':>10} {'bytes/vec':>10} {'build s':>9}")
+    for row in results:
+        print(f"{row['index_type']:<8} {row[f'recall@{args.k}']:>10.4f} {row['qps']:>10.1f} "
+              f"{row['bytes_per_vector']:>10.1f} {row['build_seconds']:>9.3f}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"corpus": corpus, "count": len(vectors), "k": args.k, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
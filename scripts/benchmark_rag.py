@@ -0,0 +1,367 @@
+# scripts/benchmark_rag.py
+"""
+Retrieval and index-build benchmarks: build time per stage, embedding throughput, index
+load time, query/mmr_query latency percentiles, batched query throughput and peak RSS.
+
+Runs offline by default with a deterministic hashing embedder over synthetic corpora;
+--embedder model uses EMBEDDING_MODEL_PATH and --bundled adds the PDFs under CODES_DIR.
+Each corpus is measured with the persistent embedding cache off and on (--embedding-cache);
+cache-on runs use a throwaway store and also report a warm rebuild served from it.
+
+    python -m scripts.benchmark_rag --sizes 50,200,800 --json results.json
+    python -m scripts.benchmark_rag --embedder model --bundled --sizes 200 --embedding-cache on
+"""
+import os
+import re
+import sys
+import json
+import time
+import zlib
+import random
+import shutil
+import logging
+import platform
+import argparse
+import resource
+import tempfile
+import subprocess
+from typing import Dict, List, Optional
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from config import Config
+
+VOCABULARY = (
+    "electrical panel board earthing grounding breaker circuit socket outlet cable conduit lighting switch "
+    "neutral phase load voltage insulation rcd mcb distribution wiring junction box fixture clearance "
+    "pipe water drainage valve trap vent fitting sewage pressure pump tank heater leak slope joint "
+    "installation shall must minimum maximum requirement compliance inspection protection rating"
+).split()
+
+CATEGORY = "benchmark"
+
+
+class HashingEmbeddings(Embeddings):
+    """Deterministic bag-of-words hashing embedder, so benchmarks need no model download"""
+
+    def __init__(self, dimension: int = 384):
+        self.dimension = dimension
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in re.findall(r"\w+", text.lower()):
+                bucket = zlib.crc32(token.encode("utf-8"))
+                vectors[row, bucket % self.dimension] += 1.0 if bucket & 1 << 31 else -1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return (vectors / np.maximum(norms, 1e-12)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_pdf(path: str, pages: List[str], line_width: int = 90):
+    """Minimal single-font PDF writer for synthetic corpora (no extra dependency)"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", b"", b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        lines = [text[i:i + line_width] for i in range(0, len(text), line_width)]
+        content = ("BT /F1 9 Tf 20 820 Td 11 TL " + " ".join(f"({_pdf_escape(line)}) '" for line in lines) + " ET").encode()
+        page_number = len(objects) + 1
+        kids.append(f"{page_number} 0 R")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 842] /Resources << /Font << /F1 3 0 R >> >> "
+            f"/Contents {page_number + 1} 0 R >>".encode()
+        )
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n".encode() + body + b"\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{offset:010d} 00000 n \n".encode() for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+def synthetic_sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(VOCABULARY) for _ in range(words))
+
+
+def synthetic_corpus(directory: str, pages: int, pages_per_pdf: int = 20, seed: int = 0) -> List[str]:
+    """Write `pages` pages of clause-like text (~2 chunks per page) across several PDFs"""
+    rng = random.Random(seed)
+    paths = []
+    for start in range(0, pages, pages_per_pdf):
+        path = os.path.join(directory, f"synthetic_{start // pages_per_pdf:04d}.pdf")
+        write_pdf(path, [
+            ". ".join(synthetic_sentence(rng, 14) for _ in range(18)) + "."
+            for _ in range(min(pages_per_pdf, pages - start))
+        ])
+        paths.append(path)
+    return paths
+
+
+def bundled_pdfs() -> List[str]:
+    paths = []
+    for category in Config.CATEGORIES:
+        directory = os.path.join(Config.CODES_DIR, category)
+        if os.path.isdir(directory):
+            paths.extend(os.path.join(directory, name) for name in sorted(os.listdir(directory)) if name.endswith(".pdf"))
+    return paths
+
+
+def peak_rss_mb() -> Dict[str, float]:
+    """Peak resident set size of this process and of its (ingest worker) children; ru_maxrss is KB on Linux"""
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1)
+    }
+
+
+def latency_stats(samples: List[float]) -> Dict[str, float]:
+    millis = np.array(samples) * 1000
+    return {
+        "count": len(samples),
+        "mean_ms": round(float(millis.mean()), 3),
+        "p50_ms": round(float(np.percentile(millis, 50)), 3),
+        "p95_ms": round(float(np.percentile(millis, 95)), 3),
+        "p99_ms": round(float(np.percentile(millis, 99)), 3),
+        "max_ms": round(float(millis.max()), 3)
+    }
+
+
+def timed(fn, *args, **kwargs):
+    started = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def install_embedder(kind: str, dimension: int):
+    """Select the embedder used by VectorStoreBuilder and RAGEngine; see use_embedding_store for the cache"""
+    from services.embedding_cache import CachedEmbeddings
+    from services.embedding_provider import EmbeddingProvider
+
+    # Never the app's own cache file: use_embedding_store attaches a throwaway store per run
+    Config.EMBEDDING_CACHE_ENABLED = False
+    if kind == "hashing":
+        EmbeddingProvider._instance = CachedEmbeddings(HashingEmbeddings(dimension), f"hashing-{dimension}")
+    else:
+        EmbeddingProvider._instance = None
+    return EmbeddingProvider.get_embedder()
+
+
+def use_embedding_store(embedder, path: Optional[str]):
+    """Cache on: persist document vectors to a fresh store at `path`; cache off: no store"""
+    from services.embedding_cache import EmbeddingStore
+
+    embedder.store = EmbeddingStore(path) if path else None
+
+
+def benchmark_corpus(name: str, pdf_paths: List[str], args, embedder) -> Dict:
+    from services.rag_engine import RAGEngine
+    from services.vector_store_builder import VectorStoreBuilder, load_and_split_pdf, file_sha256
+
+    persist_dir = tempfile.mkdtemp(prefix="bench_db_")
+    try:
+        timings: Dict[str, float] = {}
+        _, build_seconds = timed(
+            VectorStoreBuilder.build_vector_store, CATEGORY, pdf_paths, persist_dir,
+            incremental=False, workers=args.workers, index_type=args.index_type, timings=timings
+        )
+
+        # Raw embedding throughput over the corpus chunks, outside FAISS
+        texts = [
+            chunk.page_content
+            for pdf in pdf_paths
+            for chunk in load_and_split_pdf(pdf, CATEGORY, file_sha256(pdf))
+        ][:args.embed_sample]
+        _, embed_seconds = timed(embedder.embedder.embed_documents, texts)
+
+        # Cache on: rebuild from scratch with every chunk vector already in the store
+        warm = None
+        if embedder.store is not None:
+            warm_dir = os.path.join(persist_dir, "warm")
+            warm_timings: Dict[str, float] = {}
+            before = embedder.stats()
+            _, warm_seconds = timed(
+                VectorStoreBuilder.build_vector_store, CATEGORY, pdf_paths, warm_dir,
+                incremental=False, workers=args.workers, index_type=args.index_type, timings=warm_timings
+            )
+            after = embedder.stats()
+            hits, misses = after["hits"] - before["hits"], after["misses"] - before["misses"]
+            _, cached_embed_seconds = timed(embedder.embed_documents, texts)
+            warm = {
+                "total_seconds": round(warm_seconds, 3),
+                "stages_seconds": {stage: round(seconds, 3) for stage, seconds in warm_timings.items()},
+                "hit_rate": round(hits / (hits + misses), 4) if hits + misses else 0.0,
+                "cached_texts_per_second": round(len(texts) / cached_embed_seconds, 1) if cached_embed_seconds else None
+            }
+
+        load_samples = []
+        for _ in range(args.load_repeats):
+            engine, seconds = timed(RAGEngine, CATEGORY, persist_dir=persist_dir)
+            load_samples.append(seconds)
+        chunk_count = engine.vectorstore.index.ntotal
+
+        rng = random.Random(42)
+        queries = [synthetic_sentence(rng, rng.randint(8, 30)) for _ in range(args.queries)]
+
+        # Warm up code paths (page faults on the mapped index, lazy imports) before timing
+        engine.query(queries[0], k=args.k)
+        query_samples = [timed(engine.query, text, k=args.k)[1] for text in queries]
+        mmr_samples = [
+            timed(engine.mmr_query, text, k=args.k, fetch_k=args.fetch_k)[1] for text in queries
+        ]
+
+        batches = [queries[i:i + args.batch_size] for i in range(0, len(queries), args.batch_size)]
+        _, batch_seconds = timed(lambda: [engine.query_batch(batch, k=args.k) for batch in batches])
+        _, mmr_batch_seconds = timed(
+            lambda: [engine.mmr_query_batch(batch, k=args.k, fetch_k=args.fetch_k) for batch in batches]
+        )
+
+        return {
+            "corpus": name,
+            "embedding_cache": "off" if warm is None else "on",
+            "pdfs": len(pdf_paths),
+            "chunks": chunk_count,
+            "build": {
+                "total_seconds": round(build_seconds, 3),
+                "stages_seconds": {stage: round(seconds, 3) for stage, seconds in timings.items()},
+                "chunks_per_second": round(chunk_count / build_seconds, 1) if build_seconds else None
+            },
+            "warm_build": warm,
+            "embedding": {
+                "texts": len(texts),
+                "texts_per_second": round(len(texts) / embed_seconds, 1) if embed_seconds else None
+            },
+            "load": latency_stats(load_samples),
+            "query": latency_stats(query_samples),
+            "mmr_query": latency_stats(mmr_samples),
+            "query_batch": {
+                "batch_size": args.batch_size,
+                "queries_per_second": round(len(queries) / batch_seconds, 1)
+            },
+            "mmr_query_batch": {
+                "batch_size": args.batch_size,
+                "queries_per_second": round(len(queries) / mmr_batch_seconds, 1)
+            },
+            "peak_rss_mb": peak_rss_mb()
+        }
+    finally:
+        shutil.rmtree(persist_dir, ignore_errors=True)
+
+
+def environment(args) -> Dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "embedder": args.embedder if args.embedder == "hashing" else Config.EMBEDDING_MODEL_PATH,
+        "index_type": args.index_type or Config.INDEX_TYPE,
+        "embedding_cache": args.embedding_cache,
+        "k": args.k,
+        "fetch_k": args.fetch_k
+    }
+
+
+def print_report(results: List[Dict]):
+    header = (f"{'corpus':<16} {'cache':>5} {'chunks':>7} {'build s':>8} {'emb/s':>9} {'load ms':>8} "
+              f"{'q p50':>7} {'q p99':>7} {'mmr p50':>8} {'mmr p99':>8} {'batch q/s':>10} {'RSS MB':>7}")
+    print(header)
+    print("-" * len(header))
+    for row in results:
+        print(f"{row['corpus']:<16} {row['embedding_cache']:>5} {row['chunks']:>7} {row['build']['total_seconds']:>8.2f} "
+              f"{row['embedding']['texts_per_second'] or 0:>9.1f} {row['load']['p50_ms']:>8.1f} "
+              f"{row['query']['p50_ms']:>7.2f} {row['query']['p99_ms']:>7.2f} "
+              f"{row['mmr_query']['p50_ms']:>8.2f} {row['mmr_query']['p99_ms']:>8.2f} "
+              f"{row['query_batch']['queries_per_second']:>10.1f} {row['peak_rss_mb']['self']:>7.1f}")
+        stages = ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in row["build"]["stages_seconds"].items())
+        print(f"{'':<16} stages: {stages}")
+        warm = row["warm_build"]
+        if warm:
+            print(f"{'':<16} warm rebuild: {warm['total_seconds']:.2f}s, hit rate {warm['hit_rate']:.0%}, "
+                  f"cached emb/s {warm['cached_texts_per_second'] or 0:.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval and index-build benchmarks")
+    parser.add_argument("--sizes", default="50,200,800", help="Comma-separated synthetic corpus sizes in pages")
+    parser.add_argument("--bundled", action="store_true", help="Also benchmark the PDFs under CODES_DIR")
+    parser.add_argument("--embedder", choices=["hashing", "model"], default="hashing",
+                        help="Offline hashing embedder, or the configured EMBEDDING_MODEL_PATH")
+    parser.add_argument("--dimension", type=int, default=384, help="Hashing embedder dimension")
+    parser.add_argument("--index-type", default=None, help="FAISS index type (defaults to INDEX_TYPE)")
+    parser.add_argument("--workers", type=int, default=None, help="Processes for PDF parsing/chunking")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--fetch-k", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--load-repeats", type=int, default=5)
+    parser.add_argument("--embed-sample", type=int, default=2000, help="Chunks used for embedding throughput")
+    parser.add_argument("--embedding-cache", choices=["off", "on", "both"], default="both",
+                        help="Measure with the persistent embedding cache off, on (cold build + warm rebuild), or both")
+    parser.add_argument("--json", dest="json_path", help="Also write results to this JSON file")
+    parser.add_argument("--verbose", action="store_true", help="Show builder and engine logs")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING,
+                        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+
+    # Measure the engine itself, not the query result cache
+    Config.RAG_QUERY_CACHE_SIZE = 0
+    embedder = install_embedder(args.embedder, args.dimension)
+
+    corpora = []
+    work_dir = tempfile.mkdtemp(prefix="bench_pdfs_")
+    try:
+        for size in (int(value) for value in args.sizes.split(",") if value.strip()):
+            directory = os.path.join(work_dir, f"synthetic_{size}")
+            os.makedirs(directory)
+            corpora.append((f"synthetic-{size}p", synthetic_corpus(directory, size)))
+
+        if args.bundled:
+            pdfs = bundled_pdfs()
+            if pdfs:
+                corpora.append(("bundled", pdfs))
+            else:
+                print(f"No bundled PDFs found under {Config.CODES_DIR}, skipping")
+
+        cache_modes = ["off", "on"] if args.embedding_cache == "both" else [args.embedding_cache]
+        results = []
+        for name, pdf_paths in corpora:
+            for mode in cache_modes:
+                print(f"Benchmarking {name} ({len(pdf_paths)} PDFs, embedding cache {mode})...")
+                store_path = os.path.join(work_dir, f"embeddings_{name}.sqlite3") if mode == "on" else None
+                use_embedding_store(embedder, store_path)
+                results.append(benchmark_corpus(name, pdf_paths, args, embedder))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print()
+    print_report(results)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(args), "results": results}, f, indent=2)
+        print(f"\nResults written to {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
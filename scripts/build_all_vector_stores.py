@@ -1,15 +1,20 @@
 # scripts/build_all_vector_stores.py
 import os
+import json
+import argparse
+import logging
 from config import Config
 from services.vector_store_builder import VectorStoreBuilder
 
-def build_all_vector_stores():
+def build_all_vector_stores(incremental: bool = True, workers: int = None, category_workers: int = None,
+                            index_type: str = None, index_params: dict = None):
     base_pdf_dir = Config.CODES_DIR
     persist_dir = Config.DB_DIR
     categories = Config.CATEGORIES
 
     print("Starting vector DB generation...\n")
 
+    category_pdfs = {}
     for category in categories:
         category_pdf_dir = os.path.join(base_pdf_dir, category)
         if not os.path.isdir(category_pdf_dir):
@@ -27,11 +32,43 @@ def build_all_vector_stores():
             continue
 
         print(f"Processing '{category}' with {len(pdf_paths)} PDFs...")
-        VectorStoreBuilder.build_vector_store(
-            category_name=category,
-            pdf_paths=pdf_paths,
-            persist_dir=persist_dir
-        )
-        print(f"Done: Vector store created for '{category}' in {os.path.join(persist_dir, category)}\n")
+        category_pdfs[category] = pdf_paths
+
+    errors = VectorStoreBuilder.build_categories(
+        category_pdfs,
+        persist_dir=persist_dir,
+        incremental=incremental,
+        workers=workers,
+        category_workers=category_workers,
+        index_type=index_type,
+        index_params=index_params
+    )
+
+    for category, error in errors.items():
+        if error:
+            print(f"Failed: Vector store for '{category}' could not be built: {error}\n")
+        else:
+            print(f"Done: Vector store created for '{category}' in {os.path.join(persist_dir, category)}\n")
 
     print("All vector databases are ready!")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or update the vector stores for all categories")
+    parser.add_argument("--full", action="store_true", help="Rebuild from scratch instead of updating incrementally")
+    parser.add_argument("--workers", type=int, default=None, help="Processes for PDF parsing/chunking")
+    parser.add_argument("--category-workers", type=int, default=None, help="Categories built in parallel")
+    parser.add_argument("--index-type", choices=["flat", "ivf", "hnsw", "pq", "ivfpq"], default=None,
+                        help="FAISS index type (defaults to INDEX_TYPE)")
+    parser.add_argument("--index-params", type=json.loads, default=None,
+                        help='JSON index parameters, e.g. \'{"nlist": 64, "search": {"nprobe": 8}}\'')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    build_all_vector_stores(
+        incremental=not args.full,
+        workers=args.workers,
+        category_workers=args.category_workers,
+        index_type=args.index_type,
+        index_params=args.index_params
+    )
@@ -0,0 +1,110 @@
+# services/ann_index.py
+import math
+import logging
+from typing import Any, Dict, Optional, Tuple
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf", "hnsw", "pq", "ivfpq")
+
+# Build-time parameters per index type; "search" entries are applied at query time by RAGEngine
+DEFAULT_PARAMS: Dict[str, Dict[str, Any]] = {
+    "flat": {},
+    "ivf": {"nlist": None, "search": {"nprobe": 16}},
+    "hnsw": {"M": 32, "efConstruction": 80, "search": {"efSearch": 64}},
+    "pq": {"m": None, "nbits": 8},
+    "ivfpq": {"nlist": None, "m": None, "nbits": 8, "search": {"nprobe": 16}},
+}
+
+
+def _default_nlist(count: int) -> int:
+    # ~4*sqrt(n) lists, keeping at least 39 training points per centroid as FAISS recommends
+    return max(1, min(int(4 * math.sqrt(count)), count // 39))
+
+
+def _default_m(dimension: int) -> int:
+    # Sub-quantizers of ~8 dimensions each; m must divide the dimension
+    target = max(1, dimension // 8)
+    return max(m for m in range(1, target + 1) if dimension % m == 0)
+
+
+def resolve_params(index_type: str, count: int, dimension: int, overrides: Optional[Dict[str, Any]] = None) -> Dict:
+    """Merge defaults with overrides and fill in size-dependent values"""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unsupported index type '{index_type}'. Choose one of {', '.join(INDEX_TYPES)}")
+
+    params = {key: (dict(value) if isinstance(value, dict) else value)
+              for key, value in DEFAULT_PARAMS[index_type].items()}
+    for key, value in (overrides or {}).items():
+        if key == "search":
+            params.setdefault("search", {}).update(value)
+        else:
+            params[key] = value
+
+    if "nlist" in params and not params["nlist"]:
+        params["nlist"] = _default_nlist(count)
+    if "m" in params and not params["m"]:
+        params["m"] = _default_m(dimension)
+    if "nbits" in params:
+        # k-means needs at least 2**nbits training points
+        params["nbits"] = max(1, min(params["nbits"], int(math.log2(max(count, 2)))))
+    if "search" in params and "nprobe" in params["search"] and "nlist" in params:
+        params["search"]["nprobe"] = min(params["search"]["nprobe"], params["nlist"])
+    return params
+
+
+def build_index(vectors: np.ndarray, index_type: str, metric: int = faiss.METRIC_L2,
+                overrides: Optional[Dict[str, Any]] = None) -> Tuple[Any, Dict[str, Any]]:
+    """
+    Build and fill a FAISS index of the requested type from the given vectors.
+    Returns (index, config) where config is what should be stored next to the index.
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    count, dimension = vectors.shape
+    params = resolve_params(index_type, count, dimension, overrides)
+
+    if index_type == "flat":
+        index = faiss.IndexFlat(dimension, metric)
+    elif index_type == "ivf":
+        index = faiss.IndexIVFFlat(faiss.IndexFlat(dimension, metric), dimension, params["nlist"], metric)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, params["M"], metric)
+        index.hnsw.efConstruction = params["efConstruction"]
+    elif index_type == "pq":
+        index = faiss.IndexPQ(dimension, params["m"], params["nbits"], metric)
+    else:
+        index = faiss.IndexIVFPQ(
+            faiss.IndexFlat(dimension, metric), dimension, params["nlist"], params["m"], params["nbits"], metric
+        )
+
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+
+    config = {"type": index_type, "params": params}
+    apply_search_params(index, config)
+    logging.getLogger(__name__).info(f"Built {index_type} index over {count} vectors with {params}")
+    return index, config
+
+
+def apply_search_params(index, config: Optional[Dict[str, Any]]):
+    """Apply stored query-time parameters (nprobe, efSearch) and enable reconstruction for IVF indexes"""
+    if not config:
+        return
+
+    search = config.get("params", {}).get("search", {})
+    parameter_space = faiss.ParameterSpace()
+    for name, value in search.items():
+        parameter_space.set_index_parameter(index, name, value)
+
+    # MMR re-ranking reconstructs candidate vectors, which IVF indexes only support with a direct map
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        try:
+            ivf.make_direct_map()
+        except RuntimeError as e:
+            logging.getLogger(__name__).warning(f"Could not enable vector reconstruction: {str(e)}")
+
+
+def bytes_per_vector(index) -> float:
+    return len(faiss.serialize_index(index)) / max(index.ntotal, 1)
@@ -0,0 +1,131 @@
+# services/context_assembler.py
+import re
+from typing import Dict, List, Optional, Set
+from config import Config
+from utils.token_budget import estimate_tokens, truncate_to_tokens
+
+# Shortest suffix/prefix match treated as splitter overlap rather than coincidence
+MIN_OVERLAP_CHARS = 20
+# Don't bother appending a truncated passage with less room than this
+MIN_PASSAGE_TOKENS = 50
+
+
+def _chunk_sequence(match: Dict) -> Optional[int]:
+    """Position of the chunk within its PDF, from the deterministic '<hash>-<index>' chunk id"""
+    chunk_id = match.get("chunk_id") or ""
+    suffix = chunk_id.rsplit("-", 1)[-1]
+    return int(suffix) if suffix.isdigit() else None
+
+
+def _overlap_length(left: str, right: str, max_overlap: int) -> int:
+    """Length of the longest suffix of `left` that is also a prefix of `right`"""
+    for length in range(min(len(left), len(right), max_overlap), MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:length]):
+            return length
+    return 0
+
+
+def merge_overlapping(matches: List[Dict], max_overlap: int = 200) -> List[Dict]:
+    """
+    Merge chunks from the same source and page that overlap (splitter chunk_overlap) or
+    are adjacent chunks of the same PDF. Passages keep the best retrieval rank of their parts.
+    """
+    groups: Dict[tuple, List[Dict]] = {}
+    for rank, match in enumerate(matches):
+        key = (match.get("source"), match.get("page"))
+        groups.setdefault(key, []).append({**match, "rank": rank, "sequence": _chunk_sequence(match)})
+
+    passages = []
+    for (source, page), group in groups.items():
+        if all(item["sequence"] is not None for item in group):
+            group.sort(key=lambda item: item["sequence"])
+
+        current = None
+        for item in group:
+            text = item["text"].strip()
+            if current is None:
+                current = {"source": source, "page": page, "text": text, "rank": item["rank"],
+                           "sequence": item["sequence"]}
+                continue
+
+            adjacent = current["sequence"] is not None and item["sequence"] == current["sequence"] + 1
+            if text in current["text"]:
+                merged = current["text"]
+            else:
+                overlap = _overlap_length(current["text"], text, max_overlap)
+                if overlap:
+                    merged = current["text"] + text[overlap:]
+                elif adjacent:
+                    merged = f"{current['text']} {text}"
+                else:
+                    merged = None
+
+            if merged is None:
+                passages.append(current)
+                current = {"source": source, "page": page, "text": text, "rank": item["rank"],
+                           "sequence": item["sequence"]}
+            else:
+                current["text"] = merged
+                current["rank"] = min(current["rank"], item["rank"])
+                current["sequence"] = item["sequence"]
+        passages.append(current)
+
+    passages.sort(key=lambda passage: passage["rank"])
+    return passages
+
+
+def _shingles(text: str, size: int = 3) -> Set[tuple]:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) <= size:
+        return {tuple(words)}
+    return {tuple(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def drop_near_duplicates(passages: List[Dict], threshold: float) -> List[Dict]:
+    """Keep passages in rank order, skipping any whose word-shingle Jaccard similarity to a kept one reaches threshold"""
+    kept, kept_shingles = [], []
+    for passage in passages:
+        shingles = _shingles(passage["text"])
+        if any(len(shingles & other) / max(len(shingles | other), 1) >= threshold for other in kept_shingles):
+            continue
+        kept.append(passage)
+        kept_shingles.append(shingles)
+    return kept
+
+
+def _format_passage(passage: Dict) -> str:
+    location = f"{passage['source']}, page {passage['page']}" if passage.get("page") is not None else passage["source"]
+    return f"[{location}]\n{passage['text']}"
+
+
+def fit_to_budget(passages: List[Dict], token_budget: int) -> List[str]:
+    """Formatted passages in rank order until the budget is used; the last one may be truncated"""
+    blocks, used = [], 0
+    for passage in passages:
+        block = _format_passage(passage)
+        tokens = estimate_tokens(block)
+        if used + tokens <= token_budget:
+            blocks.append(block)
+            used += tokens
+            continue
+
+        remaining = token_budget - used
+        if remaining >= MIN_PASSAGE_TOKENS:
+            blocks.append(truncate_to_tokens(block, remaining - 1).rstrip() + " ...")
+        break
+    return blocks
+
+
+def assemble_context(matches: List[Dict], token_budget: Optional[int] = None,
+                     duplicate_threshold: Optional[float] = None) -> str:
+    """
+    Turn retrieval matches into a compact, cited context block: merge overlapping or
+    adjacent chunks, drop near-duplicates and fit the result to the token budget.
+    """
+    token_budget = Config.RAG_CONTEXT_TOKEN_BUDGET if token_budget is None else token_budget
+    threshold = Config.RAG_CONTEXT_DUPLICATE_THRESHOLD if duplicate_threshold is None else duplicate_threshold
+    if not matches or token_budget <= 0:
+        return ""
+
+    passages = drop_near_duplicates(merge_overlapping(matches), threshold)
+    return "\n\n".join(fit_to_budget(passages, token_budget))
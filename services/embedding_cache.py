@@ -0,0 +1,152 @@
+# services/embedding_cache.py
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# SQLite limits the number of bound parameters per statement
+_LOOKUP_BATCH = 500
+# Query vectors kept in memory only; persisting one-off queries would put a disk write on every search
+QUERY_CACHE_SIZE = 1024
+
+
+class EmbeddingStore:
+    """
+    Persistent vector cache: one float32 blob per key in SQLite (WAL mode, so builder
+    processes and the web app can share the file).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+        self._conn.commit()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), _LOOKUP_BATCH):
+                batch = keys[start:start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM vectors WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+        return found
+
+    def set_many(self, items: Dict[str, np.ndarray]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (key, vector) VALUES (?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes()) for key, vector in items.items()]
+            )
+            self._conn.commit()
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()[0]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM vectors")
+            self._conn.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Drop-in wrapper around an embedding model that only encodes texts it has not seen.
+    Vectors are keyed by model name, query prefix and text hash; identical texts within
+    one call are encoded once. query_instruction is prepended to queries (E5 "query: ").
+    Document vectors are persisted to the store; query vectors live in a small in-memory LRU.
+    """
+
+    def __init__(self, embedder: Embeddings, model_name: str, store: Optional[EmbeddingStore] = None,
+                 query_instruction: str = ""):
+        self.embedder = embedder
+        self.model_name = model_name
+        self.store = store
+        self.query_instruction = query_instruction
+        self._lock = threading.Lock()
+        self._queries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def _key(self, text: str, prefix: str) -> str:
+        digest = hashlib.sha256()
+        for part in (self.model_name, prefix, text):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\x1f")
+        return digest.hexdigest()
+
+    def _lookup_queries(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        with self._lock:
+            found = {key: self._queries[key] for key in keys if key in self._queries}
+            for key in found:
+                self._queries.move_to_end(key)
+        return found
+
+    def _remember_queries(self, vectors: Dict[str, np.ndarray]):
+        with self._lock:
+            self._queries.update(vectors)
+            while len(self._queries) > QUERY_CACHE_SIZE:
+                self._queries.popitem(last=False)
+
+    def _embed(self, texts: List[str], prefix: str, persist: bool = True) -> List[List[float]]:
+        """persist=False (queries) keeps vectors in memory instead of writing them to the store"""
+        keys = [self._key(text, prefix) for text in texts]
+        unique = list(dict.fromkeys(keys))
+        if persist:
+            vectors = self.store.get_many(unique) if self.store else {}
+        else:
+            vectors = self._lookup_queries(unique)
+
+        missing = [key for key in unique if key not in vectors]
+        if missing:
+            text_by_key = dict(zip(keys, texts))
+            computed = self.embedder.embed_documents([f"{prefix}{text_by_key[key]}" for key in missing])
+            new_vectors = {key: np.asarray(vector, dtype=np.float32) for key, vector in zip(missing, computed)}
+            if not persist:
+                self._remember_queries(new_vectors)
+            elif self.store:
+                try:
+                    self.store.set_many(new_vectors)
+                except sqlite3.Error as e:
+                    logging.getLogger(__name__).warning(f"Could not persist embeddings: {str(e)}")
+            vectors.update(new_vectors)
+
+        with self._lock:
+            self._hits += len(unique) - len(missing)
+            self._misses += len(missing)
+        return [vectors[key].tolist() for key in keys]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts, "")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text], self.query_instruction, persist=False)[0]
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """Batched embed_query: one forward pass for all uncached queries"""
+        return self._embed(texts, self.query_instruction, persist=False)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "model": self.model_name,
+                "entries": self.store.count() if self.store else 0,
+                "query_entries": len(self._queries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0
+            }
@@ -1,5 +1,6 @@
+import os
 from config import Config
-from langchain_huggingface import HuggingFaceEmbeddings
+from services.embedding_cache import CachedEmbeddings, EmbeddingStore
 
 class EmbeddingProvider:
     _instance = None
@@ -7,16 +8,31 @@ class EmbeddingProvider:
     @classmethod
     def get_embedder(cls):
         if cls._instance is None:
+            # Deferred: importing the HuggingFace stack costs seconds at startup
+            from langchain_huggingface import HuggingFaceEmbeddings
+
             model_name = Config.EMBEDDING_MODEL_PATH
 
-            # E5 models require a query instruction prompt
+            # E5 models require a query instruction prompt, applied by CachedEmbeddings
             if "e5" in model_name.lower() or "mlqa" in model_name.lower():
-                cls._instance = HuggingFaceEmbeddings(
+                embedder = HuggingFaceEmbeddings(
                     model_name=model_name,
-                    encode_kwargs={"normalize_embeddings": True},
-                    query_instruction="query: "
+                    encode_kwargs={"normalize_embeddings": True}
                 )
+                query_instruction = "query: "
             else:
-                cls._instance = HuggingFaceEmbeddings(model_name=model_name)
+                embedder = HuggingFaceEmbeddings(model_name=model_name)
+                query_instruction = ""
+
+            store = None
+            if Config.EMBEDDING_CACHE_ENABLED:
+                store = EmbeddingStore(os.path.join(Config.CACHE_DIR, "embeddings.sqlite3"))
+
+            cls._instance = CachedEmbeddings(
+                embedder,
+                model_name=model_name,
+                store=store,
+                query_instruction=query_instruction
+            )
 
         return cls._instance
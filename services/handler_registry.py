@@ -0,0 +1,87 @@
+# services/handler_registry.py
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional
+from config import Config
+
+if TYPE_CHECKING:
+    from handlers.base_handler import BaseHandler
+
+
+class HandlerRegistry:
+    """
+    Process-wide cache of category handlers, so each category's RAG index is
+    deserialized once instead of on every request. Handlers are read-only after
+    construction and are shared between request threads; reload() swaps in a
+    freshly built handler without blocking readers. The handler modules (and with
+    them FAISS, LangChain and the embedding stack) are imported on first use.
+    """
+
+    _handlers: Dict[str, "BaseHandler"] = {}
+    _locks: Dict[str, threading.Lock] = {}
+    _locks_guard = threading.Lock()
+    logger = logging.getLogger(__name__)
+
+    @classmethod
+    def _lock_for(cls, category: str) -> threading.Lock:
+        with cls._locks_guard:
+            return cls._locks.setdefault(category, threading.Lock())
+
+    @classmethod
+    def get_handler(cls, category: str) -> "BaseHandler":
+        """Return the shared handler for a category, building it on first use"""
+        handler = cls._handlers.get(category)
+        if handler is not None:
+            return handler
+
+        # One builder per category; concurrent callers wait for it instead of loading the index twice
+        with cls._lock_for(category):
+            handler = cls._handlers.get(category)
+            if handler is None:
+                from services.handler_factory import HandlerFactory
+
+                started = time.perf_counter()
+                handler = HandlerFactory.get_handler(category)
+                cls._handlers[category] = handler
+                cls.logger.info(f"Loaded handler for '{category}' in {time.perf_counter() - started:.2f}s")
+        return handler
+
+    @classmethod
+    def warm_up(cls, categories: Optional[List[str]] = None) -> Dict[str, str]:
+        """Load handlers ahead of the first request; failures are reported, not raised"""
+        status = {}
+        for category in categories or Config.CATEGORIES:
+            try:
+                cls.get_handler(category)
+                status[category] = "ready"
+            except Exception as e:
+                cls.logger.error(f"Failed to warm up handler for '{category}': {str(e)}")
+                status[category] = f"error: {str(e)}"
+        return status
+
+    @classmethod
+    def reload(cls, category: Optional[str] = None) -> Dict[str, str]:
+        """
+        Rebuild handlers (e.g. after a vector store rebuild). The previous handler keeps
+        serving until the new one is ready and stays in place if the rebuild fails.
+        Without a category, reloads the loaded handlers, or every configured category if none is loaded.
+        """
+        from services.handler_factory import HandlerFactory
+
+        categories = [category] if category else list(cls._handlers.keys()) or list(Config.CATEGORIES)
+        status = {}
+        for name in categories:
+            with cls._lock_for(name):
+                try:
+                    cls._handlers[name] = HandlerFactory.get_handler(name)
+                    status[name] = "reloaded"
+                    cls.logger.info(f"Reloaded handler for '{name}'")
+                except Exception as e:
+                    cls.logger.error(f"Failed to reload handler for '{name}': {str(e)}")
+                    status[name] = f"error: {str(e)}"
+        return status
+
+    @classmethod
+    def loaded_categories(cls) -> List[str]:
+        return list(cls._handlers.keys())
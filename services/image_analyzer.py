@@ -1,7 +1,46 @@
 # image_analyzer.py
+import json
+import re
+from typing import Any, Dict
 from llm.llm_vision_model import VisionModel
 
 class ImageAnalyzer:
     @staticmethod
     def describe(image_path: str, prompt: str) -> str:
         return VisionModel.describe(image_path, prompt)
+
+    @staticmethod
+    def inspect(image_path: str, prompt: str) -> Dict[str, Any]:
+        """Single vision call returning validation notes, verdict, reason and description"""
+        return ImageAnalyzer.parse_inspection(VisionModel.describe(image_path, prompt))
+
+    @staticmethod
+    def parse_inspection(response: str) -> Dict[str, Any]:
+        """Parse the structured inspection answer, tolerating code fences and surrounding prose"""
+        text = re.sub(r"^```(?:json)?|```$", "", response.strip(), flags=re.MULTILINE).strip()
+        start, end = text.find("{"), text.rfind("}")
+
+        try:
+            data = json.loads(text[start:end + 1]) if start != -1 and end > start else None
+        except json.JSONDecodeError:
+            data = None
+
+        if not isinstance(data, dict):
+            # Unstructured answer: use it both as the validation text and the description
+            return {
+                "validation_notes": response,
+                "is_valid": None,
+                "reason": "",
+                "description": response
+            }
+
+        is_valid = data.get("is_valid")
+        if isinstance(is_valid, str):
+            is_valid = is_valid.strip().lower() in ("true", "yes")
+
+        return {
+            "validation_notes": str(data.get("validation_notes", "")),
+            "is_valid": is_valid if isinstance(is_valid, bool) else None,
+            "reason": str(data.get("reason", "")),
+            "description": str(data.get("description", ""))
+        }
@@ -1,6 +1,8 @@
 from llm.llm_vision_model import VisionModel
 
+def matches_keywords(text: str, keywords: list) -> bool:
+    return any(keyword in text for keyword in keywords)
+
 def validate_image(image_path: str, prompt: str, keywords: list) -> bool:
     description = VisionModel.describe(image_path, prompt)
-    return any(keyword in description for keyword in keywords)
-
+    return matches_keywords(description, keywords)
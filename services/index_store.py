@@ -0,0 +1,193 @@
+# services/index_store.py
+import os
+import json
+import mmap
+import logging
+from collections.abc import Mapping
+from typing import Iterator, Optional, Union
+import faiss
+import numpy as np
+from langchain_core.documents import Document
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from services.ann_index import apply_search_params
+
+# On-disk layout of a category store:
+#   index.faiss      FAISS index, opened memory-mapped when reading
+#   chunks.bin       UTF-8 JSON records {"id", "text", "metadata"}, one per index row, concatenated
+#   chunks.offsets.npy  uint64 byte offsets into chunks.bin (rows + 1 entries)
+#   store.json       format marker, FAISS wrapper settings and the index type/tuning parameters
+STORE_FILE = "store.json"
+INDEX_FILE = "index.faiss"
+CHUNKS_FILE = "chunks.bin"
+OFFSETS_FILE = "chunks.offsets.npy"
+STORE_FORMAT = "mmap-v1"
+
+
+def has_store(directory: str) -> bool:
+    return os.path.exists(os.path.join(directory, STORE_FILE))
+
+
+def save_store(vectorstore: FAISS, directory: str, index_config: Optional[dict] = None):
+    """
+    Write a FAISS vector store in the pickle-free, mmap-friendly format. index_config
+    ({"type", "params"}) is stored so readers can apply the same query-time tuning.
+    """
+    os.makedirs(directory, exist_ok=True)
+    index = vectorstore.index
+
+    offsets = np.zeros(index.ntotal + 1, dtype=np.uint64)
+    with open(os.path.join(directory, CHUNKS_FILE), "wb") as f:
+        for row in range(index.ntotal):
+            doc_id = vectorstore.index_to_docstore_id[row]
+            doc = vectorstore.docstore.search(doc_id)
+            if not isinstance(doc, Document):
+                raise ValueError(f"Document {doc_id} for index row {row} is missing from the docstore")
+            record = json.dumps(
+                {"id": doc_id, "text": doc.page_content, "metadata": doc.metadata},
+                ensure_ascii=False
+            ).encode("utf-8")
+            f.write(record)
+            offsets[row + 1] = offsets[row] + len(record)
+
+    np.save(os.path.join(directory, OFFSETS_FILE), offsets)
+    faiss.write_index(index, os.path.join(directory, INDEX_FILE))
+
+    with open(os.path.join(directory, STORE_FILE), "w", encoding="utf-8") as f:
+        json.dump({
+            "format": STORE_FORMAT,
+            "count": int(index.ntotal),
+            "dimension": int(index.d),
+            "distance_strategy": vectorstore.distance_strategy.value,
+            "normalize_L2": bool(getattr(vectorstore, "_normalize_L2", False)),
+            "index": index_config or {"type": "flat", "params": {}}
+        }, f, indent=2)
+
+
+class MmapDocstore(Docstore):
+    """Read-only docstore over chunks.bin; documents are decoded on demand from the mapped file"""
+
+    def __init__(self, directory: str):
+        self.offsets = np.load(os.path.join(directory, OFFSETS_FILE), mmap_mode="r")
+        self._file = open(os.path.join(directory, CHUNKS_FILE), "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        # mmap cannot map an empty file
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def record(self, row: int) -> dict:
+        start, end = int(self.offsets[row]), int(self.offsets[row + 1])
+        return json.loads(self._data[start:end].decode("utf-8"))
+
+    def search(self, search: str) -> Union[str, Document]:
+        """`search` is the index row as a string (see RowIdMap)"""
+        try:
+            row = int(search)
+        except (TypeError, ValueError):
+            return f"ID {search} not found."
+        if not 0 <= row < len(self):
+            return f"ID {search} not found."
+
+        record = self.record(row)
+        return Document(id=record["id"], page_content=record["text"], metadata=record["metadata"])
+
+
+class RowIdMap(Mapping):
+    """index_to_docstore_id for MmapDocstore: row i maps to docstore key str(i) without a dict per row"""
+
+    def __init__(self, count: int):
+        self.count = count
+
+    def __getitem__(self, row: int) -> str:
+        row = int(row)
+        if not 0 <= row < self.count:
+            raise KeyError(row)
+        return str(row)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.count))
+
+
+def index_version(directory: str) -> Optional[tuple]:
+    """
+    Cheap fingerprint of the store on disk. Stores are swapped in as whole new
+    directories, so a rebuild changes the inode and mtime of its files.
+    """
+    for name in (STORE_FILE, INDEX_FILE):
+        try:
+            stat = os.stat(os.path.join(directory, name))
+        except FileNotFoundError:
+            continue
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+    return None
+
+
+def read_settings(directory: str) -> dict:
+    with open(os.path.join(directory, STORE_FILE), "r", encoding="utf-8") as f:
+        settings = json.load(f)
+    if settings.get("format") != STORE_FORMAT:
+        raise ValueError(f"Unsupported vector store format in {directory}: {settings.get('format')}")
+    return settings
+
+
+def _read_index(directory: str, use_mmap: bool):
+    path = os.path.join(directory, INDEX_FILE)
+    if not use_mmap:
+        return faiss.read_index(path)
+
+    # Newer FAISS maps in-file codes (flat, HNSW, IVF) with IO_FLAG_MMAP_IFC; older builds only map IVF lists
+    mmap_flags = [getattr(faiss, "IO_FLAG_MMAP_IFC", None), faiss.IO_FLAG_MMAP]
+    for flag in mmap_flags:
+        if flag is None:
+            continue
+        try:
+            return faiss.read_index(path, flag | faiss.IO_FLAG_READ_ONLY)
+        except RuntimeError:
+            continue
+
+    logging.getLogger(__name__).warning(f"Memory-mapped read of {path} is not supported, loading into RAM")
+    return faiss.read_index(path)
+
+
+def load_store(directory: str, embeddings, mutable: bool = False) -> FAISS:
+    """
+    Open a store written by save_store. The default read-only mode maps the index and
+    chunk file so load time is near-constant and pages are shared between processes;
+    mutable=True loads everything into RAM so the store can be updated and saved again.
+    """
+    settings = read_settings(directory)
+    index = _read_index(directory, use_mmap=not mutable)
+    apply_search_params(index, settings.get("index"))
+
+    if mutable:
+        source = MmapDocstore(directory)
+        records = [source.record(row) for row in range(len(source))]
+        docstore = InMemoryDocstore({
+            record["id"]: Document(id=record["id"], page_content=record["text"], metadata=record["metadata"])
+            for record in records
+        })
+        index_to_docstore_id = {row: record["id"] for row, record in enumerate(records)}
+    else:
+        docstore = MmapDocstore(directory)
+        index_to_docstore_id = RowIdMap(len(docstore))
+
+    if len(index_to_docstore_id) != index.ntotal:
+        raise ValueError(
+            f"Vector store in {directory} is inconsistent: {index.ntotal} vectors, {len(index_to_docstore_id)} chunks"
+        )
+
+    return FAISS(
+        embedding_function=embeddings,
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+        normalize_L2=settings.get("normalize_L2", False),
+        distance_strategy=DistanceStrategy(settings.get("distance_strategy", DistanceStrategy.EUCLIDEAN_DISTANCE.value))
+    )
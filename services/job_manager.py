@@ -0,0 +1,151 @@
+# services/job_manager.py
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+from config import Config
+
+
+class JobQueueFullError(RuntimeError):
+    """Raised when a job is submitted while JOB_MAX_PENDING jobs are already waiting"""
+
+
+class Job:
+    """State of one background analysis; progress is updated from worker threads"""
+
+    def __init__(self, category_map: Dict[str, List[str]]):
+        self.id = uuid.uuid4().hex
+        self.status = "queued"
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.categories = {
+            category: {"total_images": len(image_paths), "completed_images": 0}
+            for category, image_paths in category_map.items()
+        }
+        # Keyed by (category, position in the request), so a path listed twice is tracked twice
+        self.images: Dict[tuple, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def record_progress(self, category: str, index: int, image_path: str, image_result: Dict[str, Dict[str, Any]]):
+        """progress_callback for SimpleComplianceOrchestrator"""
+        compliance = image_result.get("compliance", {})
+        with self._lock:
+            if category in self.categories:
+                self.categories[category]["completed_images"] += 1
+            self.images[(category, index)] = {
+                "category": category,
+                "index": index,
+                "image": image_path,
+                "validation_passed": image_result.get("validation", {}).get("is_valid", False),
+                "compliance_successful": not compliance.get("skipped", False) and "error" not in compliance
+            }
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            total = sum(c["total_images"] for c in self.categories.values())
+            completed = sum(c["completed_images"] for c in self.categories.values())
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "created_at": self.created_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at,
+                "progress": {
+                    "total_images": total,
+                    "completed_images": completed,
+                    "percent": round(100 * completed / total, 1) if total else 100.0,
+                    "categories": {name: dict(counts) for name, counts in self.categories.items()},
+                    "images": list(self.images.values())
+                },
+                "error": self.error
+            }
+
+
+class JobManager:
+    """
+    Runs analysis jobs on a bounded thread pool. At most `workers` jobs run at once and
+    at most `max_pending` wait; finished jobs are dropped `ttl_seconds` after completion.
+    """
+
+    def __init__(self, workers: int, max_pending: int, ttl_seconds: float):
+        self.max_pending = max(0, max_pending)
+        self.ttl_seconds = ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="job")
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+
+    def submit(self, category_map: Dict[str, List[str]],
+               run: Callable[[Dict[str, List[str]], Job], Dict[str, Any]]) -> Job:
+        """Queue run(category_map, job) and return the job immediately"""
+        self._purge_expired()
+        job = Job(category_map)
+
+        with self._lock:
+            pending = sum(1 for existing in self._jobs.values() if existing.status == "queued")
+            if pending >= self.max_pending:
+                raise JobQueueFullError(f"Too many pending jobs ({pending}); try again later")
+            self._jobs[job.id] = job
+
+        self._executor.submit(self._run, job, category_map, run)
+        self.logger.info(f"Queued job {job.id} with {len(category_map)} categories")
+        return job
+
+    def _run(self, job: Job, category_map: Dict[str, List[str]], run: Callable):
+        job.status = "running"
+        job.started_at = time.time()
+        try:
+            job.result = run(category_map, job)
+            job.status = "completed"
+        except Exception as e:
+            self.logger.error(f"Job {job.id} failed: {str(e)}")
+            job.error = str(e)
+            job.status = "failed"
+        finally:
+            job.finished_at = time.time()
+            self.logger.info(f"Job {job.id} {job.status} in {job.finished_at - job.started_at:.1f}s")
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._purge_expired()
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _purge_expired(self):
+        cutoff = time.time() - self.ttl_seconds
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job.finished_at is not None and job.finished_at < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = {"queued": 0, "running": 0, "completed": 0, "failed": 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+            return counts
+
+
+_job_manager: Optional[JobManager] = None
+_job_manager_lock = threading.Lock()
+
+
+def get_job_manager() -> JobManager:
+    """Process-wide job manager sized from Config"""
+    global _job_manager
+    if _job_manager is None:
+        with _job_manager_lock:
+            if _job_manager is None:
+                _job_manager = JobManager(
+                    workers=Config.JOB_WORKERS,
+                    max_pending=Config.JOB_MAX_PENDING,
+                    ttl_seconds=Config.JOB_RESULT_TTL_SECONDS
+                )
+    return _job_manager
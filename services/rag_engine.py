@@ -1,7 +1,15 @@
 # services/rag_engine.py
 import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+import faiss
+import numpy as np
 from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy, maximal_marginal_relevance
 from services.embedding_provider import EmbeddingProvider
+from services.index_store import has_store, index_version, load_store, read_settings
 from config import Config
 import logging
 
@@ -28,18 +36,116 @@ class RAGEngine:
             self.logger.error(f"Vector store directory is empty: {self.persist_dir}")
             raise ValueError(f"Vector store for category '{category_name}' is empty. Please rebuild vector stores.")
 
+        # Query result cache, keyed by normalized text, search parameters and index version
+        self.cache_size = max(0, Config.RAG_QUERY_CACHE_SIZE)
+        self._cache: "OrderedDict[tuple, List[Dict]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._reloads = 0
+        self._last_version_check = time.monotonic()
+
         try:
-            embedder = EmbeddingProvider.get_embedder()
-            self.vectorstore = FAISS.load_local(
-                folder_path=self.persist_dir,
-                embeddings=embedder,
-                allow_dangerous_deserialization=True  # Fix: Add this parameter
-            )
+            self.embedder = EmbeddingProvider.get_embedder()
+            self._load_vectorstore()
 
         except Exception as e:
             self.logger.error(f"Failed to initialize vector store for '{category_name}': {str(e)}")
             raise
 
+    def _load_vectorstore(self):
+        """(Re)load the category store from disk and remember which version was loaded"""
+        version = index_version(self.persist_dir)
+        index_config = {"type": "flat", "params": {}}
+        if has_store(self.persist_dir):
+            # Memory-mapped, pickle-free store written by VectorStoreBuilder; applies stored nprobe/efSearch
+            vectorstore = load_store(self.persist_dir, self.embedder)
+            index_config = read_settings(self.persist_dir).get("index", index_config)
+        else:
+            self.logger.warning(
+                f"Loading legacy pickled vector store for '{self.category_name}'; rebuild it to use the mmap format"
+            )
+            vectorstore = FAISS.load_local(
+                folder_path=self.persist_dir,
+                embeddings=self.embedder,
+                allow_dangerous_deserialization=True  # Fix: Add this parameter
+            )
+
+        self.vectorstore = vectorstore
+        self.index_config = index_config
+        self.index_version = version
+
+    def _check_index_version(self):
+        """Reload the store and drop cached results if the index was rebuilt on disk"""
+        now = time.monotonic()
+        if now - self._last_version_check < Config.RAG_INDEX_CHECK_SECONDS:
+            return
+        self._last_version_check = now
+
+        version = index_version(self.persist_dir)
+        # None while a rebuild is swapping directories; keep serving the loaded store
+        if version is None or version == self.index_version:
+            return
+
+        with self._reload_lock:
+            if version == self.index_version:
+                return
+            try:
+                self._load_vectorstore()
+            except Exception as e:
+                self.logger.error(f"Failed to reload rebuilt vector store for '{self.category_name}': {str(e)}")
+                return
+            with self._cache_lock:
+                self._cache.clear()
+            self._reloads += 1
+            self.logger.info(f"Reloaded rebuilt vector store for '{self.category_name}'")
+
+    @staticmethod
+    def _normalize_query(text: str) -> str:
+        return " ".join(text.split()).casefold()
+
+    def _cache_key(self, method: str, text: str, *params: Any) -> tuple:
+        return (method, self._normalize_query(text), params, self.index_version)
+
+    def _cache_get(self, key: tuple) -> Optional[List[Dict]]:
+        if not self.cache_size:
+            return None
+        with self._cache_lock:
+            results = self._cache.get(key)
+            if results is None:
+                self._cache_misses += 1
+                return None
+            self._cache.move_to_end(key)
+            self._cache_hits += 1
+        # Callers may modify the returned matches
+        return [dict(match) for match in results]
+
+    def _cache_put(self, key: tuple, results: List[Dict]):
+        if not self.cache_size:
+            return
+        with self._cache_lock:
+            self._cache[key] = [dict(match) for match in results]
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        with self._cache_lock:
+            lookups = self._cache_hits + self._cache_misses
+            return {
+                "entries": len(self._cache),
+                "max_entries": self.cache_size,
+                "hits": self._cache_hits,
+                "misses": self._cache_misses,
+                "hit_rate": round(self._cache_hits / lookups, 4) if lookups else 0.0,
+                "reloads": self._reloads
+            }
+
+    def clear_cache(self):
+        with self._cache_lock:
+            self._cache.clear()
+
     def query(self, text: str, k: int = 5):
         """Perform similarity search with error handling"""
         try:
@@ -47,21 +153,26 @@ class RAGEngine:
                 self.logger.warning("Empty query text provided")
                 return []
 
+            self._check_index_version()
+            cache_key = self._cache_key("similarity", text, k)
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                return cached
+
             results = self.vectorstore.similarity_search(text, k=k)
 
             if not results:
                 self.logger.info(f"No similarity search results found for: '{text[:50]}...'")
+                self._cache_put(cache_key, [])
                 return []
 
             formatted_results = []
             for r in results:
-                formatted_results.append({
-                    "source": r.metadata.get("source", "Unknown"),
-                    "text": r.page_content,
-                    "score": getattr(r, 'score', None)  # Some vector stores provide similarity scores
-                })
+                # Some vector stores provide similarity scores
+                formatted_results.append(self._format_match(r, getattr(r, 'score', None)))
 
             self.logger.info(f"Found {len(formatted_results)} similarity matches for category '{self.category_name}'")
+            self._cache_put(cache_key, formatted_results)
             return formatted_results
 
         except Exception as e:
@@ -75,6 +186,12 @@ class RAGEngine:
                 self.logger.warning("Empty query text provided for MMR search")
                 return []
 
+            self._check_index_version()
+            cache_key = self._cache_key("mmr", text, k, fetch_k, lambda_mult)
+            cached = self._cache_get(cache_key)
+            if cached is not None:
+                return cached
+
             results = self.vectorstore.max_marginal_relevance_search(
                 query=text,
                 k=k,
@@ -84,23 +201,145 @@ class RAGEngine:
 
             if not results:
                 self.logger.info(f"No MMR search results found for: '{text[:50]}...'")
+                self._cache_put(cache_key, [])
                 return []
 
             formatted_results = []
             for r in results:
-                formatted_results.append({
-                    "source": r.metadata.get("source", "Unknown"),
-                    "text": r.page_content,
-                    "score": getattr(r, 'score', None)
-                })
+                formatted_results.append(self._format_match(r, getattr(r, 'score', None)))
 
             self.logger.info(f"Found {len(formatted_results)} MMR matches for category '{self.category_name}'")
+            self._cache_put(cache_key, formatted_results)
             return formatted_results
 
         except Exception as e:
             self.logger.error(f"Error during MMR search: {str(e)}")
             return []
 
+    def _embed_queries(self, texts: List[str]) -> np.ndarray:
+        """Embed all query texts in one forward pass, matching embed_query's query prefix"""
+        if hasattr(self.embedder, "embed_queries"):
+            vectors = self.embedder.embed_queries(texts)
+        else:
+            prefix = getattr(self.embedder, "query_instruction", "") or ""
+            vectors = self.embedder.embed_documents([f"{prefix}{text}" for text in texts])
+
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if getattr(self.vectorstore, "_normalize_L2", False):
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    def _passes_threshold(self, score: float, score_threshold: Optional[float]) -> bool:
+        """Inner-product/Jaccard scores are similarities, the rest are distances"""
+        if score_threshold is None:
+            return True
+        if self.vectorstore.distance_strategy in (DistanceStrategy.MAX_INNER_PRODUCT, DistanceStrategy.JACCARD):
+            return score >= score_threshold
+        return score <= score_threshold
+
+    def _lookup_document(self, index_id: int):
+        doc_id = self.vectorstore.index_to_docstore_id.get(int(index_id))
+        if doc_id is None:
+            return None
+        doc = self.vectorstore.docstore.search(doc_id)
+        return doc if hasattr(doc, "page_content") else None
+
+    @staticmethod
+    def _format_match(doc, score: Optional[float]) -> Dict:
+        # PyPDFLoader pages are 0-based; report the printed page label or the 1-based page number
+        page = doc.metadata.get("page_label") or (
+            doc.metadata["page"] + 1 if isinstance(doc.metadata.get("page"), int) else None
+        )
+        return {
+            "source": doc.metadata.get("source", "Unknown"),
+            "page": page,
+            "chunk_id": doc.metadata.get("chunk_id"),
+            "text": doc.page_content,
+            "score": score
+        }
+
+    def _prepare_batch(self, texts: List[str]):
+        """Indices of the non-empty texts and their embeddings"""
+        self._check_index_version()
+        positions = [i for i, text in enumerate(texts) if text and text.strip()]
+        if len(positions) < len(texts):
+            self.logger.warning(f"Skipping {len(texts) - len(positions)} empty query texts in batch")
+        if not positions:
+            return positions, None
+        return positions, self._embed_queries([texts[i] for i in positions])
+
+    def query_batch(self, texts: List[str], k: int = 5, score_threshold: Optional[float] = None) -> List[List[Dict]]:
+        """
+        Similarity search for many texts at once: one batched embedding pass and one
+        matrix search. Returns one result list per input text, in input order.
+        """
+        results: List[List[Dict]] = [[] for _ in texts]
+        try:
+            positions, vectors = self._prepare_batch(texts)
+            if not positions:
+                return results
+
+            scores, indices = self.vectorstore.index.search(vectors, k)
+
+            for row, position in enumerate(positions):
+                for score, index_id in zip(scores[row], indices[row]):
+                    if index_id == -1 or not self._passes_threshold(float(score), score_threshold):
+                        continue
+                    doc = self._lookup_document(index_id)
+                    if doc is not None:
+                        results[position].append(self._format_match(doc, float(score)))
+
+            self.logger.info(f"Batch similarity search for {len(positions)} queries in category '{self.category_name}'")
+            return results
+
+        except Exception as e:
+            self.logger.error(f"Error during batch similarity search: {str(e)}")
+            return results
+
+    def mmr_query_batch(self, texts: List[str], k: int = 5, fetch_k: int = 20, lambda_mult: float = 0.5,
+                        score_threshold: Optional[float] = None) -> List[List[Dict]]:
+        """
+        MMR search for many texts at once: one batched embedding pass and one matrix search
+        for the fetch_k candidates, then MMR re-ranking per query. Results are in input order.
+        """
+        results: List[List[Dict]] = [[] for _ in texts]
+        try:
+            positions, vectors = self._prepare_batch(texts)
+            if not positions:
+                return results
+
+            scores, indices = self.vectorstore.index.search(vectors, fetch_k)
+
+            for row, position in enumerate(positions):
+                candidates = [
+                    (int(index_id), float(score))
+                    for score, index_id in zip(scores[row], indices[row])
+                    if index_id != -1 and self._passes_threshold(float(score), score_threshold)
+                ]
+                if not candidates:
+                    continue
+
+                candidate_vectors = np.array(
+                    [self.vectorstore.index.reconstruct(index_id) for index_id, _ in candidates],
+                    dtype=np.float32
+                )
+                selected = maximal_marginal_relevance(
+                    vectors[row:row + 1], candidate_vectors, k=k, lambda_mult=lambda_mult
+                )
+
+                for selected_index in selected:
+                    index_id, score = candidates[selected_index]
+                    doc = self._lookup_document(index_id)
+                    if doc is not None:
+                        results[position].append(self._format_match(doc, score))
+
+            self.logger.info(f"Batch MMR search for {len(positions)} queries in category '{self.category_name}'")
+            return results
+
+        except Exception as e:
+            self.logger.error(f"Error during batch MMR search: {str(e)}")
+            return results
+
     def get_collection_info(self):
         """Get information about the vector store collection"""
         try:
@@ -110,7 +349,8 @@ class RAGEngine:
                 return {
                     "count": ntotal,
                     "name": self.category_name,
-                    "metadata": None
+                    "metadata": {"index": self.index_config},
+                    "query_cache": self.cache_stats()
                 }
             else:
                 return {
@@ -1,90 +1,318 @@
 # services/vector_store_builder.py
 import os
+import json
+import time
 import shutil
+import hashlib
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Optional
 from langchain_community.vectorstores import FAISS
 from langchain_community.document_loaders import PyPDFLoader
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_community.vectorstores.utils import DistanceStrategy
+import faiss
+from services.ann_index import build_index
 from services.embedding_provider import EmbeddingProvider
+from services.index_store import has_store, load_store, save_store
+from config import Config
+
+MANIFEST_FILE = "manifest.json"
+MANIFEST_VERSION = 1
+CHUNK_SIZE = 800
+CHUNK_OVERLAP = 150
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def make_splitter() -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=CHUNK_SIZE,
+        chunk_overlap=CHUNK_OVERLAP,
+        length_function=len,
+        separators=["\n\n", "\n", ".", "!", "?", ",", " ", ""]
+    )
+
+
+def source_key(pdf: str, category_name: str) -> str:
+    """
+    Manifest key of a PDF: its path relative to the category's codes folder, so same-named
+    PDFs in different subfolders stay apart (and top-level PDFs keep their file name).
+    PDFs outside that folder are keyed by their absolute path.
+    """
+    category_root = os.path.abspath(os.path.join(Config.CODES_DIR, category_name))
+    path = os.path.abspath(pdf)
+    if os.path.commonpath([category_root, path]) == category_root:
+        return os.path.relpath(path, category_root).replace(os.sep, "/")
+    return path
+
+
+def load_and_split_pdf(pdf: str, category_name: str, file_hash: str, key: Optional[str] = None) -> list:
+    """
+    Load one PDF and split it into chunks with deterministic IDs derived from the file
+    hash and its source key, so byte-identical copies under different names don't collide.
+    Raises ValueError when the PDF yields no pages.
+    """
+    logger = logging.getLogger(__name__)
+
+    logger.info(f"Loading PDF: {pdf}")
+    docs = PyPDFLoader(pdf).load()
+    if not docs:
+        raise ValueError(f"No documents loaded from PDF: {pdf}")
+
+    # Add source metadata
+    for doc in docs:
+        doc.metadata["source"] = os.path.basename(pdf)
+        doc.metadata["category"] = category_name
+    logger.info(f"Successfully loaded {len(docs)} pages from {pdf}")
+
+    key = key or source_key(pdf, category_name)
+    key_hash = hashlib.sha256(key.encode("utf-8")).hexdigest()[:8]
+    chunks = make_splitter().split_documents(docs)
+    for i, chunk in enumerate(chunks):
+        chunk.metadata["chunk_id"] = f"{file_hash[:16]}-{key_hash}-{i:06d}"
+    return chunks
+
+
+@contextmanager
+def stage_timer(timings: Dict[str, float], stage: str):
+    """Accumulate the wall time of a build stage into timings[stage]"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - started
+
+
+def log_stage_timings(category_name: str, timings: Dict[str, float]):
+    logging.getLogger(__name__).info(
+        f"⏱️ Stage timings for '{category_name}': "
+        + ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in timings.items())
+        + f" (total {sum(timings.values()):.2f}s)"
+    )
+
+
+def _build_category_worker(category: str, pdf_paths: List[str], persist_dir: str, incremental: bool,
+                           workers: int, index_type: Optional[str], index_params: Optional[Dict]) -> int:
+    """Process-pool entry point: build one category and return its document count"""
+    vectorstore = VectorStoreBuilder.build_vector_store(
+        category_name=category,
+        pdf_paths=pdf_paths,
+        persist_dir=persist_dir,
+        incremental=incremental,
+        workers=workers,
+        index_type=index_type,
+        index_params=index_params
+    )
+    return vectorstore.index.ntotal
 
 
 class VectorStoreBuilder:
     @staticmethod
-    def build_vector_store(category_name: str, pdf_paths: list[str], persist_dir: str = "vectorstores"):
-        logger = logging.getLogger(__name__)
+    def _load_manifest(category_dir: str) -> Optional[Dict]:
+        path = os.path.join(category_dir, MANIFEST_FILE)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logging.getLogger(__name__).warning(f"Ignoring unreadable manifest {path}: {str(e)}")
+            return None
 
-        if not pdf_paths:
-            logger.error(f"No PDF paths provided for category '{category_name}'")
-            raise ValueError(f"No PDF paths provided for category '{category_name}'")
+    @staticmethod
+    def _new_manifest(index_type: str, index_params: Dict) -> Dict:
+        return {
+            "version": MANIFEST_VERSION,
+            "embedding_model": Config.EMBEDDING_MODEL_PATH,
+            "chunking": {"chunk_size": CHUNK_SIZE, "chunk_overlap": CHUNK_OVERLAP},
+            "index": {"type": index_type, "params": index_params},
+            "files": {}
+        }
 
-        all_docs = []
+    @staticmethod
+    def _manifest_compatible(manifest: Optional[Dict], index_type: str, index_params: Dict) -> bool:
+        """An index can only be updated in place if it was built with the same model, chunking and index type"""
+        expected = VectorStoreBuilder._new_manifest(index_type, index_params)
+        return bool(manifest) and all(
+            manifest.get(field) == expected[field] for field in ("version", "embedding_model", "chunking", "index")
+        )
+
+    @staticmethod
+    def _convert_index(vectorstore, index_type: str, index_params: Dict) -> Dict:
+        """Replace the exact index built by FAISS.from_documents with the requested ANN index"""
+        if index_type == "flat":
+            return {"type": "flat", "params": {}}
+
+        vectors = vectorstore.index.reconstruct_n(0, vectorstore.index.ntotal)
+        metric = (faiss.METRIC_INNER_PRODUCT
+                  if vectorstore.distance_strategy == DistanceStrategy.MAX_INNER_PRODUCT else faiss.METRIC_L2)
+        # Row order is preserved, so index_to_docstore_id stays valid
+        vectorstore.index, index_config = build_index(vectors, index_type, metric, index_params)
+        return index_config
+
+    @staticmethod
+    def _load_chunks(category_name: str, pdf_hashes: Dict[str, str], workers: int = 1) -> tuple:
+        """
+        Load and split PDFs, in a process pool when workers > 1. Returns (chunks per PDF in
+        input order, failed PDF paths); the output is identical to the serial path.
+        """
+        logger = logging.getLogger(__name__)
+        chunks_by_pdf = {}
         failed_pdfs = []
 
-        # Load all PDFs into documents
-        for pdf in pdf_paths:
-            if not os.path.exists(pdf):
-                logger.warning(f"PDF file not found: {pdf}")
+        if workers > 1 and len(pdf_hashes) > 1:
+            logger.info(f"Parsing {len(pdf_hashes)} PDFs with {min(workers, len(pdf_hashes))} worker processes")
+            with ProcessPoolExecutor(max_workers=min(workers, len(pdf_hashes))) as executor:
+                futures = {
+                    pdf: executor.submit(load_and_split_pdf, pdf, category_name, file_hash,
+                                         source_key(pdf, category_name))
+                    for pdf, file_hash in pdf_hashes.items()
+                }
+                for pdf, future in futures.items():
+                    try:
+                        chunks_by_pdf[pdf] = future.result()
+                    except Exception as e:
+                        logger.error(f"Error loading PDF {pdf}: {str(e)}")
+                        failed_pdfs.append(pdf)
+            return chunks_by_pdf, failed_pdfs
+
+        for pdf, file_hash in pdf_hashes.items():
+            try:
+                chunks_by_pdf[pdf] = load_and_split_pdf(pdf, category_name, file_hash, source_key(pdf, category_name))
+            except Exception as e:
+                logger.error(f"Error loading PDF {pdf}: {str(e)}")
                 failed_pdfs.append(pdf)
-                continue
 
-            try:
-                logger.info(f"Loading PDF: {pdf}")
-                loader = PyPDFLoader(pdf)
-                docs = loader.load()
+        return chunks_by_pdf, failed_pdfs
+
+    @staticmethod
+    def _log_sample_chunks(category_name: str, chunks: list):
+        # Print sample chunks for debugging
+        logger = logging.getLogger(__name__)
+        logger.info(f"Sample chunks for '{category_name}':")
+        for i, chunk in enumerate(chunks[:3]):
+            logger.info(f"Chunk #{i + 1} (length: {len(chunk.page_content)}):")
+            logger.info(f"Content: {chunk.page_content[:200]}...")
+            logger.info(f"Metadata: {chunk.metadata}")
+            logger.info("-" * 50)
+
+    @staticmethod
+    def _load_existing(category_dir: str, embedder, mutable: bool):
+        """Open the current store; stores from before the mmap format are read from their pickle"""
+        if has_store(category_dir):
+            return load_store(category_dir, embedder, mutable=mutable)
+        return FAISS.load_local(
+            folder_path=category_dir,
+            embeddings=embedder,
+            allow_dangerous_deserialization=True
+        )
+
+    @staticmethod
+    def _persist(vectorstore, category_dir: str, manifest: Dict, index_config: Dict):
+        """
+        Write the index and manifest to a staging directory, then swap it in, so readers
+        never see a half-written store
+        """
+        staging_dir = f"{category_dir}.staging"
+        previous_dir = f"{category_dir}.previous"
+        for path in (staging_dir, previous_dir):
+            if os.path.exists(path):
+                shutil.rmtree(path)
+
+        save_store(vectorstore, staging_dir, index_config)
+        with open(os.path.join(staging_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        if os.path.exists(category_dir):
+            os.rename(category_dir, previous_dir)
+        os.rename(staging_dir, category_dir)
+        if os.path.exists(previous_dir):
+            shutil.rmtree(previous_dir)
+
+    @staticmethod
+    def build_vector_store(category_name: str, pdf_paths: list[str], persist_dir: str = "vectorstores",
+                           incremental: bool = True, workers: Optional[int] = None,
+                           index_type: Optional[str] = None, index_params: Optional[Dict] = None,
+                           timings: Optional[Dict[str, float]] = None):
+        """
+        Build or update the category's vector store.
+
+        With incremental=True and a compatible manifest from a previous build, only new or
+        changed PDFs are parsed and embedded, vectors of removed or changed PDFs are deleted,
+        and the existing FAISS index is updated in place. Otherwise the store is rebuilt.
+        PDFs are parsed and chunked in `workers` processes (Config.INGEST_WORKERS by default).
+        index_type/index_params select the FAISS index (Config.INDEX_TYPE/INDEX_PARAMS by default);
+        approximate index types are rebuilt in full whenever the PDFs change.
+        Per-stage wall times are logged and, if a dict is passed as `timings`, accumulated into it.
+        """
+        logger = logging.getLogger(__name__)
 
-                if not docs:
-                    logger.warning(f"No documents loaded from PDF: {pdf}")
-                    failed_pdfs.append(pdf)
+        if not pdf_paths:
+            logger.error(f"No PDF paths provided for category '{category_name}'")
+            raise ValueError(f"No PDF paths provided for category '{category_name}'")
+
+        workers = max(1, workers or Config.INGEST_WORKERS)
+        index_type = index_type or Config.INDEX_TYPE
+        index_params = Config.INDEX_PARAMS if index_params is None else index_params
+        timings = {} if timings is None else timings
+
+        pdf_hashes = {}
+        with stage_timer(timings, "hash"):
+            for pdf in pdf_paths:
+                if not os.path.exists(pdf):
+                    logger.warning(f"PDF file not found: {pdf}")
                     continue
+                pdf_hashes[pdf] = file_sha256(pdf)
+
+        category_dir = os.path.join(persist_dir, category_name)
+        manifest = VectorStoreBuilder._load_manifest(category_dir) if incremental else None
 
-                # Add source metadata
-                for doc in docs:
-                    doc.metadata["source"] = os.path.basename(pdf)
-                    doc.metadata["category"] = category_name
+        try:
+            if VectorStoreBuilder._manifest_compatible(manifest, index_type, index_params):
+                vectorstore = VectorStoreBuilder._update_vector_store(category_name, pdf_paths, pdf_hashes,
+                                                                      category_dir, manifest, workers, timings)
+                if vectorstore is not None:
+                    return vectorstore
+            elif incremental:
+                logger.info(f"No compatible manifest for '{category_name}', doing a full build")
+
+            return VectorStoreBuilder._full_build(category_name, pdf_paths, pdf_hashes, category_dir,
+                                                  workers, timings, index_type, index_params)
+        finally:
+            log_stage_timings(category_name, timings)
 
-                all_docs.extend(docs)
-                logger.info(f"Successfully loaded {len(docs)} pages from {pdf}")
+    @staticmethod
+    def _full_build(category_name: str, pdf_paths: List[str], pdf_hashes: Dict[str, str], category_dir: str,
+                    workers: int, timings: Dict[str, float], index_type: str, index_params: Dict):
+        logger = logging.getLogger(__name__)
 
-            except Exception as e:
-                logger.error(f"Error loading PDF {pdf}: {str(e)}")
-                failed_pdfs.append(pdf)
-                continue
+        with stage_timer(timings, "parse_and_chunk"):
+            chunks_by_pdf, failed_pdfs = VectorStoreBuilder._load_chunks(category_name, pdf_hashes, workers)
+        failed_pdfs = [pdf for pdf in pdf_paths if pdf not in pdf_hashes] + failed_pdfs
 
-        if not all_docs:
+        if not chunks_by_pdf:
             logger.error(f"No documents were successfully loaded for category '{category_name}'")
             raise ValueError(f"No documents were successfully loaded for category '{category_name}'")
 
         if failed_pdfs:
             logger.warning(f"Failed to load {len(failed_pdfs)} PDFs: {failed_pdfs}")
 
-        logger.info(f"Total documents loaded: {len(all_docs)}")
-
-        # Split documents into chunks
-        splitter = RecursiveCharacterTextSplitter(
-            chunk_size=800,
-            chunk_overlap=150,
-            length_function=len,
-            separators=["\n\n", "\n", ".", "!", "?", ",", " ", ""]
-        )
-
-        try:
-            chunks = splitter.split_documents(all_docs)
-            logger.info(f"Created {len(chunks)} chunks from {len(all_docs)} documents")
-        except Exception as e:
-            logger.error(f"Error splitting documents: {str(e)}")
-            raise
+        chunks = [chunk for pdf_chunks in chunks_by_pdf.values() for chunk in pdf_chunks]
+        logger.info(f"Created {len(chunks)} chunks from {len(chunks_by_pdf)} PDFs")
 
         if not chunks:
             logger.error("No chunks were created from the documents")
             raise ValueError("No chunks were created from the documents")
 
-        # Print sample chunks for debugging
-        logger.info(f"Sample chunks for '{category_name}':")
-        for i, chunk in enumerate(chunks[:3]):
-            logger.info(f"Chunk #{i + 1} (length: {len(chunk.page_content)}):")
-            logger.info(f"Content: {chunk.page_content[:200]}...")
-            logger.info(f"Metadata: {chunk.metadata}")
-            logger.info("-" * 50)
+        VectorStoreBuilder._log_sample_chunks(category_name, chunks)
 
         # Initialize embedding model
         try:
@@ -94,21 +322,22 @@ class VectorStoreBuilder:
             logger.error(f"Error initializing embedding model: {str(e)}")
             raise
 
-        # Build and persist vector store
-        category_dir = os.path.join(persist_dir, category_name)
-
-        if os.path.exists(category_dir):
-            logger.info(f"Removing existing vector store: {category_dir}")
-            shutil.rmtree(category_dir)
-
-        os.makedirs(category_dir, exist_ok=True)
+        manifest = VectorStoreBuilder._new_manifest(index_type, index_params)
+        for pdf, pdf_chunks in chunks_by_pdf.items():
+            manifest["files"][source_key(pdf, category_name)] = {
+                "sha256": pdf_hashes[pdf],
+                "chunk_ids": [chunk.metadata["chunk_id"] for chunk in pdf_chunks]
+            }
 
         try:
             logger.info(f"Building vector store for '{category_name}' with {len(chunks)} chunks...")
-            vectorstore = FAISS.from_documents(documents=chunks, embedding=embedder)
-
-            # Save the vector store
-            vectorstore.save_local(folder_path=category_dir)
+            with stage_timer(timings, "embed_and_index"):
+                vectorstore = FAISS.from_documents(
+                    documents=chunks,
+                    embedding=embedder,
+                    ids=[chunk.metadata["chunk_id"] for chunk in chunks]
+                )
+                index_config = VectorStoreBuilder._convert_index(vectorstore, index_type, index_params)
 
             # Fix: Check document count properly for FAISS
             doc_count = vectorstore.index.ntotal if hasattr(vectorstore, 'index') else len(chunks)
@@ -117,28 +346,154 @@ class VectorStoreBuilder:
                 logger.error("Vector store was created but contains no documents")
                 raise ValueError("Vector store was created but contains no documents")
 
+            # Save the vector store
+            with stage_timer(timings, "persist"):
+                VectorStoreBuilder._persist(vectorstore, category_dir, manifest, index_config)
             logger.info(f"Vector store created successfully with {doc_count} documents")
 
-            # Optional test query
-            try:
-                test_results = vectorstore.similarity_search("test", k=1)
-                logger.info(f"Vector store test successful. Found {len(test_results)} test results")
-            except Exception as e:
-                logger.warning(f"Vector store test failed: {str(e)}")
+        except Exception as e:
+            logger.error(f"Error building vector store: {str(e)}")
+            raise
+
+        VectorStoreBuilder._test_vector_store(vectorstore)
+        return vectorstore
+
+    @staticmethod
+    def _update_vector_store(category_name: str, pdf_paths: List[str], pdf_hashes: Dict[str, str],
+                             category_dir: str, manifest: Dict, workers: int, timings: Dict[str, float]):
+        """Update a flat index in place; returns None when a full build is needed instead"""
+        logger = logging.getLogger(__name__)
+
+        current = {source_key(pdf, category_name): pdf for pdf in pdf_hashes}
+        previous = manifest["files"]
+
+        to_load = {
+            pdf: pdf_hashes[pdf] for name, pdf in current.items()
+            if previous.get(name, {}).get("sha256") != pdf_hashes[pdf]
+        }
+        removed = [name for name in previous if name not in current]
+
+        if not to_load and not removed:
+            logger.info(f"Vector store for '{category_name}' is up to date ({len(previous)} PDFs unchanged)")
+            return VectorStoreBuilder._load_existing(category_dir, EmbeddingProvider.get_embedder(), mutable=False)
+
+        if manifest["index"]["type"] != "flat":
+            # Approximate indexes are trained on the corpus, so changes warrant retraining
+            logger.info(f"'{category_name}' uses a {manifest['index']['type']} index, doing a full build")
+            return None
+
+        with stage_timer(timings, "parse_and_chunk"):
+            chunks_by_pdf, failed_pdfs = VectorStoreBuilder._load_chunks(category_name, to_load, workers)
+        failed_pdfs = [pdf for pdf in pdf_paths if pdf not in pdf_hashes] + failed_pdfs
+        if failed_pdfs:
+            # A changed PDF that fails to load keeps its previous vectors
+            logger.warning(f"Failed to load {len(failed_pdfs)} PDFs: {failed_pdfs}")
+
+        stale_ids = [chunk_id for name in removed for chunk_id in previous[name]["chunk_ids"]]
+        for pdf in chunks_by_pdf:
+            stale_ids.extend(previous.get(source_key(pdf, category_name), {}).get("chunk_ids", []))
 
-            return vectorstore
+        new_chunks = [chunk for pdf_chunks in chunks_by_pdf.values() for chunk in pdf_chunks]
+        logger.info(
+            f"Updating '{category_name}': {len(chunks_by_pdf)} new/changed PDFs ({len(new_chunks)} chunks), "
+            f"{len(removed)} removed PDFs, {len(stale_ids)} stale vectors"
+        )
+
+        if new_chunks:
+            VectorStoreBuilder._log_sample_chunks(category_name, new_chunks)
+
+        try:
+            embedder = EmbeddingProvider.get_embedder()
+            with stage_timer(timings, "load_index"):
+                vectorstore = VectorStoreBuilder._load_existing(category_dir, embedder, mutable=True)
+
+            with stage_timer(timings, "embed_and_index"):
+                if stale_ids:
+                    vectorstore.delete(stale_ids)
+                if new_chunks:
+                    vectorstore.add_documents(new_chunks, ids=[chunk.metadata["chunk_id"] for chunk in new_chunks])
+
+            doc_count = vectorstore.index.ntotal
+            if doc_count == 0:
+                logger.error("Vector store update left no documents")
+                raise ValueError("Vector store update left no documents")
+
+            for name in removed:
+                del previous[name]
+            for pdf, pdf_chunks in chunks_by_pdf.items():
+                previous[source_key(pdf, category_name)] = {
+                    "sha256": pdf_hashes[pdf],
+                    "chunk_ids": [chunk.metadata["chunk_id"] for chunk in pdf_chunks]
+                }
+
+            with stage_timer(timings, "persist"):
+                VectorStoreBuilder._persist(vectorstore, category_dir, manifest, {"type": "flat", "params": {}})
+            logger.info(f"Vector store updated successfully with {doc_count} documents")
 
         except Exception as e:
-            logger.error(f"Error building vector store: {str(e)}")
-            if os.path.exists(category_dir):
-                shutil.rmtree(category_dir)
+            logger.error(f"Error updating vector store: {str(e)}")
             raise
 
+        VectorStoreBuilder._test_vector_store(vectorstore)
+        return vectorstore
+
+    @staticmethod
+    def _test_vector_store(vectorstore):
+        # Optional test query
+        logger = logging.getLogger(__name__)
+        try:
+            test_results = vectorstore.similarity_search("test", k=1)
+            logger.info(f"Vector store test successful. Found {len(test_results)} test results")
+        except Exception as e:
+            logger.warning(f"Vector store test failed: {str(e)}")
+
     @staticmethod
-    def rebuild_all_vector_stores():
-        """Rebuild all vector stores from scratch"""
-        from config import Config
+    def build_categories(category_pdfs: Dict[str, List[str]], persist_dir: str, incremental: bool = True,
+                         workers: Optional[int] = None, category_workers: Optional[int] = None,
+                         index_type: Optional[str] = None,
+                         index_params: Optional[Dict] = None) -> Dict[str, Optional[str]]:
+        """
+        Build several categories, in separate processes when category_workers > 1.
+        Returns the error message per category, or None for categories that were built.
+        """
+        logger = logging.getLogger(__name__)
+        workers = max(1, workers or Config.INGEST_WORKERS)
+        category_workers = max(1, category_workers or Config.INGEST_CATEGORY_WORKERS)
+        errors: Dict[str, Optional[str]] = {}
+
+        if category_workers > 1 and len(category_pdfs) > 1:
+            with ProcessPoolExecutor(max_workers=min(category_workers, len(category_pdfs))) as executor:
+                futures = {
+                    category: executor.submit(_build_category_worker, category, pdf_paths, persist_dir,
+                                              incremental, workers, index_type, index_params)
+                    for category, pdf_paths in category_pdfs.items()
+                }
+                for category, future in futures.items():
+                    try:
+                        doc_count = future.result()
+                        logger.info(f"Successfully rebuilt vector store for '{category}' ({doc_count} documents)")
+                        errors[category] = None
+                    except Exception as e:
+                        logger.error(f"Failed to rebuild vector store for '{category}': {str(e)}")
+                        errors[category] = str(e)
+            return errors
+
+        for category, pdf_paths in category_pdfs.items():
+            try:
+                _build_category_worker(category, pdf_paths, persist_dir, incremental, workers,
+                                       index_type, index_params)
+                logger.info(f"Successfully rebuilt vector store for '{category}'")
+                errors[category] = None
+            except Exception as e:
+                logger.error(f"Failed to rebuild vector store for '{category}': {str(e)}")
+                errors[category] = str(e)
+        return errors
 
+    @staticmethod
+    def rebuild_all_vector_stores(incremental: bool = True, workers: Optional[int] = None,
+                                  category_workers: Optional[int] = None, index_type: Optional[str] = None,
+                                  index_params: Optional[Dict] = None):
+        """Update all vector stores, or rebuild them from scratch with incremental=False"""
         logger = logging.getLogger(__name__)
         base_pdf_dir = Config.CODES_DIR
         persist_dir = Config.DB_DIR
@@ -146,6 +501,7 @@ class VectorStoreBuilder:
 
         logger.info("Starting complete vector store rebuild...")
 
+        category_pdfs = {}
         for category in categories:
             category_pdf_dir = os.path.join(base_pdf_dir, category)
             if not os.path.isdir(category_pdf_dir):
@@ -162,16 +518,10 @@ class VectorStoreBuilder:
                 logger.warning(f"No PDFs found for '{category}' in {category_pdf_dir}")
                 continue
 
-            try:
-                logger.info(f"Rebuilding vector store for '{category}' with {len(pdf_paths)} PDFs...")
-                VectorStoreBuilder.build_vector_store(
-                    category_name=category,
-                    pdf_paths=pdf_paths,
-                    persist_dir=persist_dir
-                )
-                logger.info(f"Successfully rebuilt vector store for '{category}'")
-            except Exception as e:
-                logger.error(f"Failed to rebuild vector store for '{category}': {str(e)}")
-                continue
+            logger.info(f"Rebuilding vector store for '{category}' with {len(pdf_paths)} PDFs...")
+            category_pdfs[category] = pdf_paths
+
+        VectorStoreBuilder.build_categories(category_pdfs, persist_dir, incremental, workers, category_workers,
+                                            index_type, index_params)
 
-        logger.info("Vector store rebuild complete!")
\ No newline at end of file
+        logger.info("Vector store rebuild complete!")
@@ -1,16 +1,42 @@
-from typing import Dict, List, Any
-from services.handler_factory import HandlerFactory
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Any, Callable, Optional, Tuple
+from services.handler_registry import HandlerRegistry
+from config import Config
+from utils.image_dedupe import group_near_duplicates
+from utils.metrics import span
+from utils.response_cache import bypass_cache
 import logging
 
 
 class SimpleComplianceOrchestrator:
-    def __init__(self, category_map: Dict[str, List[str]]):
+    def __init__(self, category_map: Dict[str, List[str]], concurrent: Optional[bool] = None,
+                 max_workers: Optional[int] = None, max_category_workers: Optional[int] = None,
+                 progress_callback: Optional[Callable[[str, int, str, Dict[str, Any]], None]] = None,
+                 use_cache: bool = True):
+        """
+        Args:
+            category_map: Mapping of category name to the image paths to inspect
+            concurrent: Process images and categories in parallel (defaults to Config.ORCHESTRATOR_CONCURRENT)
+            max_workers: Upper bound on images processed at once across all categories
+            max_category_workers: Upper bound on categories processed at once
+            progress_callback: Called as (category, index, image_path, image_result) after each image finishes,
+                index being the image's position in category_map[category]
+            use_cache: False answers every model call fresh instead of from the response caches
+        """
         self.category_map = category_map
+        self.concurrent = Config.ORCHESTRATOR_CONCURRENT if concurrent is None else concurrent
+        self.max_workers = max(1, max_workers or Config.MAX_IMAGE_WORKERS)
+        self.max_category_workers = max(1, max_category_workers or Config.MAX_CATEGORY_WORKERS)
+        self.progress_callback = progress_callback
+        self.use_cache = use_cache
         self.logger = logging.getLogger(__name__)
 
     def _safe_validate_image(self, handler, image_path: str) -> Dict[str, Any]:
         try:
-            return handler.validate_image(image_path)
+            with span("validation", category=handler.category_name):
+                return handler.validate_image(image_path)
         except Exception as e:
             self.logger.error(f"Error validating image {image_path}: {str(e)}")
             return {
@@ -22,11 +48,18 @@ class SimpleComplianceOrchestrator:
         if not validation_result.get("is_valid", False):
             return {
                 "skipped": True,
-                "reason": validation_result.get("reason", "Image validation failed")
+                "reason": validation_result.get("reason", "Image validation failed"),
+                # The reason may be the model's own wording, so summaries can't rely on it
+                "validation_failed": True
             }
 
+        # Combined vision mode already described the image during validation
+        if validation_result.get("description"):
+            return {"description": validation_result["description"]}
+
         try:
-            return handler.analyze_image(image_path)
+            with span("description", category=handler.category_name):
+                return handler.analyze_image(image_path)
         except Exception as e:
             self.logger.error(f"Error analyzing image {image_path}: {str(e)}")
             return {
@@ -45,7 +78,8 @@ class SimpleComplianceOrchestrator:
             }
 
         try:
-            return handler.get_compliance_analysis(analysis_result["description"])
+            with span("compliance", category=handler.category_name):
+                return handler.get_compliance_analysis(analysis_result["description"])
         except Exception as e:
             self.logger.error(f"Error getting compliance analysis: {str(e)}")
             return {
@@ -54,6 +88,237 @@ class SimpleComplianceOrchestrator:
                 "error": f"Compliance analysis error: {str(e)}"
             }
 
+    def _process_image(self, handler, image_path: str, category: Optional[str] = None,
+                       index: int = 0) -> Dict[str, Dict[str, Any]]:
+        """Run validation, analysis and compliance for a single image"""
+        self.logger.info(f"Processing image: {image_path}")
+
+        try:
+            with span("image", category=handler.category_name):
+                validation = self._safe_validate_image(handler, image_path)
+                analysis = self._safe_analyze_image(handler, image_path, validation)
+                compliance = self._safe_get_compliance(handler, analysis)
+        except Exception as e:
+            self.logger.error(f"Error processing image {image_path}: {str(e)}")
+            validation = {"is_valid": False, "reason": f"Image processing error: {str(e)}"}
+            analysis = {"skipped": True, "reason": validation["reason"]}
+            compliance = analysis
+
+        result = {
+            "validation": validation,
+            "analysis": analysis,
+            "compliance": compliance
+        }
+        self._report_progress(category, index, image_path, result)
+        return result
+
+    def _group_images(self, category: str, image_paths: List[str]) -> List[List[int]]:
+        """
+        Positions of a category's images grouped by near-duplicate; the first is analyzed.
+        A path listed more than once lands in one group, every listing of it up front.
+        """
+        unique_paths = list(dict.fromkeys(image_paths))
+        if not Config.IMAGE_DEDUP_ENABLED or len(unique_paths) < 2:
+            path_groups = [[image_path] for image_path in unique_paths]
+        else:
+            with span("deduplication", category=category):
+                path_groups = group_near_duplicates(unique_paths, Config.IMAGE_DEDUP_HAMMING_THRESHOLD)
+
+        positions: Dict[str, List[int]] = {}
+        for index, image_path in enumerate(image_paths):
+            positions.setdefault(image_path, []).append(index)
+        return [[index for image_path in group for index in positions[image_path]] for group in path_groups]
+
+    def _process_group(self, handler, image_paths: List[str], group: List[int],
+                       category: Optional[str] = None) -> List[Tuple[int, Dict[str, Dict[str, Any]]]]:
+        """Run the pipeline for the group's first image and fan its result out to the other positions"""
+        representative = image_paths[group[0]]
+        result = self._process_image(handler, representative, category, group[0])
+        outcomes = [(group[0], result)]
+
+        for index in group[1:]:
+            image_path = image_paths[index]
+            # The same path listed again shares the result but is not a duplicate of itself
+            member_result = result if image_path == representative else {**result, "duplicate_of": representative}
+            self._report_progress(category, index, image_path, member_result)
+            outcomes.append((index, member_result))
+        return outcomes
+
+    def _report_progress(self, category: Optional[str], index: int, image_path: str,
+                         result: Dict[str, Dict[str, Any]]):
+        if self.progress_callback is None:
+            return
+        try:
+            self.progress_callback(category, index, image_path, result)
+        except Exception as e:
+            self.logger.warning(f"Progress callback failed for {image_path}: {str(e)}")
+
+    @staticmethod
+    def _submit(executor, fn: Callable, *args):
+        """Submit with a copy of the caller's context, so per-request settings such as cache bypass follow the work"""
+        return executor.submit(contextvars.copy_context().run, fn, *args)
+
+    @contextmanager
+    def _image_executor(self):
+        """Shared pool bounding the number of images in flight across all categories"""
+        if not self.concurrent:
+            yield None
+            return
+
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="image") as executor:
+            yield executor
+
+    def _process_images(self, handler, category: str, image_paths: List[str],
+                        executor) -> List[Dict[str, Dict[str, Any]]]:
+        """Process images sequentially or on the executor, keeping input order"""
+        groups = self._group_images(category, image_paths)
+        if executor is None:
+            outcomes = [self._process_group(handler, image_paths, group, category) for group in groups]
+        else:
+            futures = [self._submit(executor, self._process_group, handler, image_paths, group, category)
+                       for group in groups]
+            outcomes = [future.result() for future in futures]
+
+        image_results = [None] * len(image_paths)
+        for outcome in outcomes:
+            for index, image_result in outcome:
+                image_results[index] = image_result
+        return image_results
+
+    def _iter_images(self, handler, category: str, image_paths: List[str],
+                     executor) -> Iterator[Tuple[int, Dict[str, Dict[str, Any]]]]:
+        """Yield (position in image_paths, image_result) as each image finishes"""
+        groups = self._group_images(category, image_paths)
+        if executor is None:
+            for group in groups:
+                yield from self._process_group(handler, image_paths, group, category)
+            return
+
+        futures = [self._submit(executor, self._process_group, handler, image_paths, group, category)
+                   for group in groups]
+        for future in as_completed(futures):
+            yield from future.result()
+
+    def _map_categories(self, fn: Callable[[str, List[str]], Any]) -> List[Tuple[str, Any]]:
+        """Apply fn to every category, in parallel when enabled, keeping input order"""
+        items = list(self.category_map.items())
+
+        if not self.concurrent or len(items) <= 1:
+            return [(category, fn(category, image_paths)) for category, image_paths in items]
+
+        workers = min(self.max_category_workers, len(items))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="category") as executor:
+            futures = [self._submit(executor, fn, category, image_paths) for category, image_paths in items]
+            return [(category, future.result()) for (category, _), future in zip(items, futures)]
+
+    def _process_category_with_table(self, category: str, image_paths: List[str], image_executor) -> Dict[str, Any]:
+        """Process all images of one category and build its compliance table"""
+        self.logger.info(f"Processing category: {category}")
+        outcome = {"table": None, "summary": None, "errors": []}
+
+        try:
+            handler = HandlerRegistry.get_handler(category)
+        except Exception as e:
+            error_msg = f"Failed to create handler for {category}: {str(e)}"
+            self.logger.error(error_msg)
+            outcome["errors"].append(error_msg)
+            outcome["table"] = {
+                "error": error_msg,
+                "category": category
+            }
+            return outcome
+
+        image_results = self._process_images(handler, category, image_paths, image_executor)
+        category_processing_summary, category_compliance_analyses = self._summarize_images(image_paths, image_results)
+
+        # Generate compliance table for the category
+        try:
+            with span("table_generation", category=category):
+                outcome["table"] = handler.generate_compliance_table(category_compliance_analyses)
+            self.logger.info(f"Successfully generated compliance table for {category}")
+        except Exception as e:
+            error_msg = f"Error generating compliance table for {category}: {str(e)}"
+            self.logger.error(error_msg)
+            outcome["errors"].append(error_msg)
+            outcome["table"] = {
+                "error": error_msg,
+                "category": category
+            }
+
+        outcome["summary"] = category_processing_summary
+        return outcome
+
+    def _summarize_images(self, image_paths: List[str],
+                          image_results: List[Dict[str, Dict[str, Any]]]) -> Tuple[Dict[str, Any], List[Dict]]:
+        """Processing summary of a category, near-duplicate groups included, and the successful compliance analyses"""
+        category_compliance_analyses = []
+        category_processing_summary = {
+            "total_images": len(image_paths),
+            "processed_successfully": 0,
+            "validation_failures": 0,
+            "processing_errors": 0,
+            "unique_images": 0,
+            "duplicate_groups": {},
+            "image_details": {}
+        }
+
+        seen_paths = set()
+        for image_path, image_result in zip(image_paths, image_results):
+            validation = image_result["validation"]
+            analysis = image_result["analysis"]
+            compliance = image_result["compliance"]
+            duplicate_of = image_result.get("duplicate_of")
+            # A path listed again shares its first listing's result and is counted once
+            repeated = image_path in seen_paths
+            seen_paths.add(image_path)
+
+            # Track processing results
+            category_processing_summary["image_details"][image_path] = {
+                "validation_passed": validation.get("is_valid", False),
+                "analysis_successful": not analysis.get("skipped", False),
+                "compliance_successful": not compliance.get("skipped", False) and "error" not in compliance
+            }
+
+            if duplicate_of and not repeated:
+                category_processing_summary["image_details"][image_path]["duplicate_of"] = duplicate_of
+                category_processing_summary["duplicate_groups"].setdefault(duplicate_of, []).append(image_path)
+            elif not repeated:
+                category_processing_summary["unique_images"] += 1
+
+            if compliance.get("skipped", False):
+                reason = compliance.get("reason", "")
+                if compliance.get("validation_failed") or "validation" in reason:
+                    category_processing_summary["validation_failures"] += 1
+                else:
+                    category_processing_summary["processing_errors"] += 1
+            elif "error" in compliance:
+                category_processing_summary["processing_errors"] += 1
+            else:
+                category_processing_summary["processed_successfully"] += 1
+                # A near-duplicate repeats its representative's analysis; the table needs it once
+                if not duplicate_of and not repeated:
+                    category_compliance_analyses.append(compliance)
+
+        return category_processing_summary, category_compliance_analyses
+
+    def _process_category(self, category: str, image_paths: List[str], image_executor) -> Dict[str, Any]:
+        """Process all images of one category without table generation"""
+        try:
+            handler = HandlerRegistry.get_handler(category)
+        except Exception as e:
+            return {
+                path: {
+                    "skipped": True,
+                    "reason": f"Failed to create handler: {str(e)}"
+                } for path in image_paths
+            }
+
+        image_results = self._process_images(handler, category, image_paths, image_executor)
+        return {
+            image_path: image_result["compliance"]
+            for image_path, image_result in zip(image_paths, image_results)
+        }
+
     def run_with_tables(self) -> Dict[str, Any]:
         """
         Runs compliance checks and generates table JSON for each category
@@ -68,73 +333,18 @@ class SimpleComplianceOrchestrator:
         }
 
         try:
-            for category, image_paths in self.category_map.items():
-                self.logger.info(f"Processing category: {category}")
-
-                try:
-                    handler = HandlerFactory.get_handler(category)
-                except Exception as e:
-                    error_msg = f"Failed to create handler for {category}: {str(e)}"
-                    self.logger.error(error_msg)
-                    results["errors"].append(error_msg)
-                    results["compliance_tables"][category] = {
-                        "error": error_msg,
-                        "category": category
-                    }
-                    continue
-
-                # Process all images in the category
-                category_compliance_analyses = []
-                category_processing_summary = {
-                    "total_images": len(image_paths),
-                    "processed_successfully": 0,
-                    "validation_failures": 0,
-                    "processing_errors": 0,
-                    "image_details": {}
-                }
+            with bypass_cache(not self.use_cache), self._image_executor() as image_executor:
+                outcomes = self._map_categories(
+                    lambda category, image_paths: self._process_category_with_table(
+                        category, image_paths, image_executor
+                    )
+                )
 
-                for image_path in image_paths:
-                    self.logger.info(f"Processing image: {image_path}")
-
-                    # Process individual image
-                    validation = self._safe_validate_image(handler, image_path)
-                    analysis = self._safe_analyze_image(handler, image_path, validation)
-                    compliance = self._safe_get_compliance(handler, analysis)
-
-                    # Track processing results
-                    category_processing_summary["image_details"][image_path] = {
-                        "validation_passed": validation.get("is_valid", False),
-                        "analysis_successful": not analysis.get("skipped", False),
-                        "compliance_successful": not compliance.get("skipped", False) and "error" not in compliance
-                    }
-
-                    if compliance.get("skipped", False):
-                        reason = compliance.get("reason", "")
-                        if "validation" in reason:
-                            category_processing_summary["validation_failures"] += 1
-                        else:
-                            category_processing_summary["processing_errors"] += 1
-                    elif "error" in compliance:
-                        category_processing_summary["processing_errors"] += 1
-                    else:
-                        category_processing_summary["processed_successfully"] += 1
-                        category_compliance_analyses.append(compliance)
-
-                # Generate compliance table for the category
-                try:
-                    compliance_table = handler.generate_compliance_table(category_compliance_analyses)
-                    results["compliance_tables"][category] = compliance_table
-                    self.logger.info(f"Successfully generated compliance table for {category}")
-                except Exception as e:
-                    error_msg = f"Error generating compliance table for {category}: {str(e)}"
-                    self.logger.error(error_msg)
-                    results["errors"].append(error_msg)
-                    results["compliance_tables"][category] = {
-                        "error": error_msg,
-                        "category": category
-                    }
-
-                results["processing_summary"][category] = category_processing_summary
+            for category, outcome in outcomes:
+                results["errors"].extend(outcome["errors"])
+                results["compliance_tables"][category] = outcome["table"]
+                if outcome["summary"] is not None:
+                    results["processing_summary"][category] = outcome["summary"]
 
             return results
 
@@ -144,28 +354,91 @@ class SimpleComplianceOrchestrator:
             results["errors"].append(error_msg)
             return results
 
+    def _stream_category(self, category: str, image_paths: List[str], image_executor,
+                         generate_tables: bool, results: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Events for one category; fills `results` in the shape run()/run_with_tables() return"""
+        try:
+            handler = HandlerRegistry.get_handler(category)
+        except Exception as e:
+            error_msg = f"Failed to create handler for {category}: {str(e)}"
+            self.logger.error(error_msg)
+            if generate_tables:
+                results["errors"].append(error_msg)
+                results["compliance_tables"][category] = {"error": error_msg, "category": category}
+                yield {"event": "table", "category": category, "table": results["compliance_tables"][category]}
+            else:
+                results[category] = {}
+                for image_path in image_paths:
+                    results[category][image_path] = {"skipped": True, "reason": f"Failed to create handler: {str(e)}"}
+                    yield {"event": "image", "category": category, "image": image_path,
+                           "result": results[category][image_path]}
+            return
+
+        image_results = [None] * len(image_paths)
+        for index, image_result in self._iter_images(handler, category, image_paths, image_executor):
+            image_results[index] = image_result
+            event = {"event": "image", "category": category, "image": image_paths[index],
+                     "result": image_result["compliance"]}
+            if image_result.get("duplicate_of"):
+                event["duplicate_of"] = image_result["duplicate_of"]
+            yield event
+
+        if not generate_tables:
+            results[category] = {
+                image_path: image_result["compliance"] for image_path, image_result in zip(image_paths, image_results)
+            }
+            return
+
+        summary, analyses = self._summarize_images(image_paths, image_results)
+        results["processing_summary"][category] = summary
+
+        table = None
+        with span("table_generation", category=category, mode="stream"):
+            for kind, value in handler.generate_compliance_table_stream(analyses):
+                if kind == "token":
+                    yield {"event": "table_token", "category": category, "text": value}
+                else:
+                    table = value
+
+        results["compliance_tables"][category] = table
+        yield {"event": "table", "category": category, "table": table, "summary": summary}
+
+    def stream(self, generate_tables: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Run the analysis as a stream of events: "image" as each image finishes, "table_token"
+        and "table" while a category's table is written, and a final "done" whose "results"
+        match run_with_tables() (or run() when generate_tables is False). Categories are
+        processed one after another so their table tokens are not interleaved.
+        """
+        results = {"compliance_tables": {}, "processing_summary": {}, "errors": []} if generate_tables else {}
+
+        try:
+            with bypass_cache(not self.use_cache), self._image_executor() as image_executor:
+                for category, image_paths in self.category_map.items():
+                    self.logger.info(f"Streaming category: {category}")
+                    yield from self._stream_category(category, image_paths, image_executor, generate_tables, results)
+
+        except Exception as e:
+            error_msg = f"Error running orchestrator: {str(e)}"
+            self.logger.error(error_msg)
+            if generate_tables:
+                results["errors"].append(error_msg)
+            else:
+                results = {"error": f"System execution error: {str(e)}", "categories": list(self.category_map.keys())}
+
+        yield {"event": "done", "results": results}
+
     def run(self) -> Dict[str, Any]:
         """Original method - runs compliance checks without table generation"""
         results = {}
         try:
-            for category, image_paths in self.category_map.items():
-                try:
-                    handler = HandlerFactory.get_handler(category)
-                except Exception as e:
-                    results[category] = {
-                        path: {
-                            "skipped": True,
-                            "reason": f"Failed to create handler: {str(e)}"
-                        } for path in image_paths
-                    }
-                    continue
+            with bypass_cache(not self.use_cache), self._image_executor() as image_executor:
+                outcomes = self._map_categories(
+                    lambda category, image_paths: self._process_category(category, image_paths, image_executor)
+                )
 
-                results[category] = {}
-                for image_path in image_paths:
-                    validation = self._safe_validate_image(handler, image_path)
-                    analysis = self._safe_analyze_image(handler, image_path, validation)
-                    compliance = self._safe_get_compliance(handler, analysis)
-                    results[category][image_path] = compliance
+            for category, category_results in outcomes:
+                results[category] = category_results
 
             return results
 
@@ -201,7 +474,7 @@ class SimpleComplianceOrchestrator:
             for image_path, image_result in category_results.items():
                 if image_result.get("skipped", False):
                     reason = image_result.get("reason", "")
-                    if "validation" in reason or "suitable" in reason:
+                    if image_result.get("validation_failed") or "validation" in reason or "suitable" in reason:
                         category_summary["failed_validation"] += 1
                         summary["validation_failures"] += 1
                     else:
@@ -0,0 +1,77 @@
+# test_base_handler.py
+import json
+from typing import List
+
+import pytest
+
+from handlers.base_handler import BaseHandler
+from services.image_analyzer import ImageAnalyzer
+from services.image_validator import matches_keywords
+
+
+class StubHandler(BaseHandler):
+    keyword_validation = True
+
+    def _initialize_rag(self):
+        pass
+
+    validation_prompt = "Is this an electrical installation?"
+    vision_analysis_prompt = "Describe the electrical installation."
+    compliance_analysis_prompt = "Check compliance."
+    table_generation_prompt = "Build the table."
+
+    @property
+    def validation_keywords(self) -> List[str]:
+        return ["breaker", "socket"]
+
+    @property
+    def category_items(self) -> List[str]:
+        return ["breakers", "sockets"]
+
+
+def _inspect_with(monkeypatch, answer: dict, keyword_validation: bool = True) -> dict:
+    response = json.dumps(answer)
+    monkeypatch.setattr(ImageAnalyzer, "inspect",
+                        staticmethod(lambda image_path, prompt: ImageAnalyzer.parse_inspection(response)))
+    handler = StubHandler("electricity")
+    handler.keyword_validation = keyword_validation
+    return handler.inspect_image("photo.jpg")
+
+
+def test_keyword_mismatch_does_not_reuse_the_models_approval(monkeypatch):
+    """The model said valid but no keyword matched: its 'suitable because' reason must not be the rejection"""
+    answer = {
+        "validation_notes": "A tidy room with a lamp.",
+        "is_valid": True,
+        "reason": "Suitable because the lighting fixture is clearly visible.",
+        "description": "A room with a lamp."
+    }
+    assert not matches_keywords(answer["validation_notes"], ["breaker", "socket"])
+
+    result = _inspect_with(monkeypatch, answer)
+
+    assert result["is_valid"] is False
+    assert result["reason"] == "The image is not suitable for the 'electricity' category."
+    assert "description" not in result
+
+
+@pytest.mark.parametrize("keyword_validation", [True, False])
+def test_model_rejection_reason_is_returned(monkeypatch, keyword_validation):
+    answer = {
+        "validation_notes": "A kitchen sink.",
+        "is_valid": False,
+        "reason": "The photo shows plumbing, not electrical work.",
+        "description": "A kitchen sink."
+    }
+
+    result = _inspect_with(monkeypatch, answer, keyword_validation)
+
+    assert result == {"is_valid": False, "reason": "The photo shows plumbing, not electrical work."}
+
+
+def test_missing_model_reason_falls_back_to_generic_text(monkeypatch):
+    answer = {"validation_notes": "A kitchen sink.", "is_valid": False, "description": ""}
+
+    result = _inspect_with(monkeypatch, answer, keyword_validation=False)
+
+    assert result["reason"] == "The image is not suitable for the 'electricity' category."
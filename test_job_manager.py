@@ -0,0 +1,33 @@
+# test_job_manager.py
+from services.handler_registry import HandlerRegistry
+from services.job_manager import Job
+from simple_orchestrator import SimpleComplianceOrchestrator
+
+
+class StubHandler:
+    category_name = "electricity"
+
+    def validate_image(self, image_path):
+        return {"is_valid": image_path != "blurry.jpg", "reason": "Too blurry"}
+
+    def analyze_image(self, image_path):
+        return {"description": f"Photo {image_path}"}
+
+    def get_compliance_analysis(self, description):
+        return {"description": description, "code_matches": []}
+
+
+def test_progress_tracks_a_repeated_path_per_position(monkeypatch):
+    monkeypatch.setitem(HandlerRegistry._handlers, "electricity", StubHandler())
+    category_map = {"electricity": ["panel.jpg", "blurry.jpg", "panel.jpg"]}
+    job = Job(category_map)
+
+    SimpleComplianceOrchestrator(category_map, concurrent=False, progress_callback=job.record_progress).run()
+
+    progress = job.to_dict()["progress"]
+    assert progress["completed_images"] == progress["total_images"] == 3
+    images = sorted(progress["images"], key=lambda image: image["index"])
+    assert [(image["index"], image["image"]) for image in images] == [
+        (0, "panel.jpg"), (1, "blurry.jpg"), (2, "panel.jpg")
+    ]
+    assert [image["validation_passed"] for image in images] == [True, False, True]
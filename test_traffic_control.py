@@ -0,0 +1,86 @@
+# test_traffic_control.py
+import asyncio
+
+import utils.llm_models_utils as llm_models_utils
+import utils.openrouter_scheduler as openrouter_scheduler
+from utils.openrouter_scheduler import OpenRouterScheduler
+from utils.traffic_control import AdaptiveConcurrencyLimiter
+
+
+class FakeStreamResponse:
+    status_code = 200
+    ok = True
+    headers = {}
+
+    def __init__(self, lines):
+        self.lines = lines
+        self.closed = False
+
+    def iter_lines(self, decode_unicode=False):
+        return iter(self.lines)
+
+    def close(self):
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _stream_lines(*chunks):
+    lines = [f'data: {{"choices": [{{"delta": {{"content": "{chunk}"}}}}]}}' for chunk in chunks]
+    return [line.encode("utf-8") for line in lines + ["data: [DONE]"]]
+
+
+def test_async_waiter_wakes_on_release():
+    limiter = AdaptiveConcurrencyLimiter(initial=1, minimum=1, maximum=1)
+    limiter.acquire()
+
+    async def scenario():
+        waiter = asyncio.ensure_future(limiter.acquire_async())
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        limiter.release()
+        await asyncio.wait_for(waiter, timeout=1)
+
+    asyncio.run(scenario())
+    assert limiter.in_flight == 1
+    assert limiter.stats()["waits"] == 1
+
+
+def test_cancelled_async_waiter_is_forgotten():
+    limiter = AdaptiveConcurrencyLimiter(initial=1, minimum=1, maximum=1)
+    limiter.acquire()
+
+    async def scenario():
+        waiter = asyncio.ensure_future(limiter.acquire_async())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+
+    asyncio.run(scenario())
+    assert not limiter._async_waiters
+    limiter.release()
+    assert limiter.in_flight == 0
+
+
+def test_stream_holds_its_slot_until_consumed_or_closed(monkeypatch):
+    limiter = AdaptiveConcurrencyLimiter(initial=4, minimum=1, maximum=4)
+    scheduler = OpenRouterScheduler(["key"], rate=100, burst=100, limiter=limiter)
+    monkeypatch.setattr(openrouter_scheduler, "_scheduler", scheduler)
+    monkeypatch.setattr(llm_models_utils, "post_json",
+                        lambda url, payload, headers, **kwargs: FakeStreamResponse(_stream_lines("a", "b")))
+
+    consumed = llm_models_utils.call_text_model_stream("desc", "prompt", models=["m"], use_cache=False)
+    assert next(consumed) == "a"
+    assert limiter.in_flight == 1
+    assert list(consumed) == ["b"]
+    assert limiter.in_flight == 0
+
+    abandoned = llm_models_utils.call_text_model_stream("desc", "prompt", models=["m"], use_cache=False)
+    next(abandoned)
+    assert limiter.in_flight == 1
+    abandoned.close()
+    assert limiter.in_flight == 0
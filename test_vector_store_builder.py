@@ -0,0 +1,54 @@
+# test_vector_store_builder.py
+import json
+import os
+import shutil
+
+from config import Config
+from scripts.benchmark_rag import HashingEmbeddings, write_pdf
+from services.embedding_cache import CachedEmbeddings
+from services.embedding_provider import EmbeddingProvider
+from services.vector_store_builder import MANIFEST_FILE, VectorStoreBuilder
+
+
+PAGES = [
+    "Circuit breakers shall be installed in an accessible distribution board. " * 8,
+    "Every socket outlet in a wet area shall be protected by a residual current device. " * 8,
+]
+
+
+def _use_hashing_embedder(monkeypatch):
+    monkeypatch.setattr(Config, "EMBEDDING_CACHE_ENABLED", False)
+    monkeypatch.setattr(EmbeddingProvider, "_instance", CachedEmbeddings(HashingEmbeddings(64), "hashing-64"))
+
+
+def test_identical_pdfs_under_different_names(tmp_path, monkeypatch):
+    """Byte-identical PDFs, including same-named ones in subfolders, build without ID clashes"""
+    _use_hashing_embedder(monkeypatch)
+    codes_dir = tmp_path / "codes"
+    category_dir = codes_dir / "electricity"
+    (category_dir / "annex").mkdir(parents=True)
+    monkeypatch.setattr(Config, "CODES_DIR", str(codes_dir))
+
+    original = category_dir / "code.pdf"
+    write_pdf(str(original), PAGES)
+    copies = [category_dir / "code copy.pdf", category_dir / "annex" / "code.pdf"]
+    for copy in copies:
+        shutil.copyfile(original, copy)
+    pdf_paths = [str(path) for path in [original] + copies]
+
+    persist_dir = str(tmp_path / "stores")
+    vectorstore = VectorStoreBuilder.build_vector_store("electricity", pdf_paths, persist_dir=persist_dir,
+                                                        workers=1, index_type="flat")
+
+    with open(os.path.join(persist_dir, "electricity", MANIFEST_FILE), encoding="utf-8") as f:
+        files = json.load(f)["files"]
+    assert sorted(files) == ["annex/code.pdf", "code copy.pdf", "code.pdf"]
+
+    chunk_ids = [chunk_id for entry in files.values() for chunk_id in entry["chunk_ids"]]
+    assert len(chunk_ids) == len(set(chunk_ids))
+    assert vectorstore.index.ntotal == len(chunk_ids)
+
+    # Removing one copy only drops that copy's vectors
+    vectorstore = VectorStoreBuilder.build_vector_store("electricity", pdf_paths[:2], persist_dir=persist_dir,
+                                                        workers=1, index_type="flat")
+    assert vectorstore.index.ntotal == len(chunk_ids) - len(files["annex/code.pdf"]["chunk_ids"])
@@ -0,0 +1,107 @@
+# utils/http_client.py
+import asyncio
+import json
+import logging
+import threading
+import weakref
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from config import Config
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+# aiohttp sessions are bound to the event loop that created them
+_async_sessions = weakref.WeakKeyDictionary()
+
+
+def get_timeout() -> tuple:
+    """(connect, read) timeout in seconds used for every OpenRouter call"""
+    return Config.HTTP_CONNECT_TIMEOUT, Config.HTTP_READ_TIMEOUT
+
+
+def get_session() -> requests.Session:
+    """Process-wide keep-alive session with a connection pool sized for concurrent callers"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=4,
+                    pool_maxsize=Config.HTTP_POOL_MAXSIZE,
+                    max_retries=0
+                )
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _session = session
+                logging.info(f"🔌 Created pooled HTTP session (pool size {Config.HTTP_POOL_MAXSIZE})")
+    return _session
+
+
+def post_json(url: str, payload: Dict[str, Any], headers: Dict[str, str], **kwargs) -> requests.Response:
+    """POST a JSON payload through the shared session"""
+    return get_session().post(url, json=payload, headers=headers, timeout=get_timeout(), **kwargs)
+
+
+def close_session():
+    """Close the shared session, e.g. on worker shutdown"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
+
+
+class AsyncResponse:
+    """Minimal response object mirroring the parts of requests.Response the callers use"""
+
+    def __init__(self, status_code: int, text: str, headers: Dict[str, str]):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    def json(self) -> Any:
+        return json.loads(self.text)
+
+
+async def get_async_session():
+    """Keep-alive aiohttp session for the running event loop"""
+    try:
+        import aiohttp
+    except ImportError as e:
+        raise ImportError("aiohttp is required for the async OpenRouter client: pip install aiohttp") from e
+
+    loop = asyncio.get_running_loop()
+    session = _async_sessions.get(loop)
+    if session is None or session.closed:
+        connect_timeout, read_timeout = get_timeout()
+        session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=Config.HTTP_ASYNC_MAX_CONNECTIONS),
+            timeout=aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        )
+        _async_sessions[loop] = session
+    return session
+
+
+async def post_json_async(url: str, payload: Dict[str, Any], headers: Dict[str, str]) -> AsyncResponse:
+    """POST a JSON payload through the event loop's shared aiohttp session"""
+    session = await get_async_session()
+    async with session.post(url, json=payload, headers=headers) as response:
+        text = await response.text()
+        return AsyncResponse(response.status, text, CaseInsensitiveDict(response.headers))
+
+
+async def close_async_session():
+    """Close the aiohttp session bound to the running event loop"""
+    session = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
@@ -0,0 +1,68 @@
+# utils/image_dedupe.py
+import logging
+from typing import List, Optional
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it every image is its own group
+    Image = None
+    ImageOps = None
+
+logger = logging.getLogger(__name__)
+
+
+def dhash(image_path: str, hash_size: int = 8) -> Optional[int]:
+    """
+    Difference hash: compare neighbouring pixels of a small grayscale thumbnail.
+    Robust to resizing, recompression and small exposure changes. None if unreadable.
+    """
+    if Image is None:
+        return None
+    try:
+        with Image.open(image_path) as img:
+            img = ImageOps.exif_transpose(img).convert("L")
+            img = img.resize((hash_size + 1, hash_size), Image.LANCZOS)
+            pixels = list(img.getdata())
+    except Exception as e:
+        logger.warning(f"⚠️ Could not hash {image_path}: {str(e)}")
+        return None
+
+    value = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def group_near_duplicates(image_paths: List[str], threshold: int, hash_size: int = 8) -> List[List[str]]:
+    """
+    Group images whose hashes are within `threshold` bits of a group's first image.
+    Groups and their members keep input order; the first member is the representative.
+    Images that cannot be hashed always form a group of their own; a path listed more
+    than once is only grouped once.
+    """
+    image_paths = list(dict.fromkeys(image_paths))
+    groups: List[List[str]] = []
+    representatives: List[tuple] = []  # (hash, group index)
+
+    for image_path in image_paths:
+        value = dhash(image_path, hash_size)
+        if value is not None:
+            match = next((index for rep_hash, index in representatives
+                          if hamming_distance(value, rep_hash) <= threshold), None)
+            if match is not None:
+                groups[match].append(image_path)
+                continue
+            representatives.append((value, len(groups)))
+        groups.append([image_path])
+
+    duplicates = len(image_paths) - len(groups)
+    if duplicates:
+        logger.info(f"🖼️ {duplicates} near-duplicate image(s) in {len(image_paths)}, {len(groups)} unique")
+    return groups
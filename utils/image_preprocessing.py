@@ -0,0 +1,127 @@
+# utils/image_preprocessing.py
+import hashlib
+import io
+import logging
+import mimetypes
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple
+
+from config import Config
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # Pillow is optional; without it images are uploaded as-is
+    Image = None
+    ImageOps = None
+
+
+class PreparedImage(NamedTuple):
+    data: bytes
+    mime_type: str
+    source_hash: str
+    original_bytes: int
+
+
+class ImagePreprocessor:
+    """
+    Downscales, orientation-normalizes and re-encodes images before they are uploaded
+    to the vision model. Processed bytes are kept in a small in-memory LRU keyed by the
+    source content hash, so an image shared by several prompts is only processed once.
+    """
+
+    _cache: "OrderedDict[tuple, PreparedImage]" = OrderedDict()
+    _lock = threading.Lock()
+    _stats = {"images": 0, "cache_hits": 0, "original_bytes": 0, "processed_bytes": 0}
+    logger = logging.getLogger(__name__)
+
+    @classmethod
+    def prepare(cls, image_path: str) -> PreparedImage:
+        with open(image_path, "rb") as f:
+            raw = f.read()
+
+        source_hash = hashlib.sha256(raw).hexdigest()
+        cache_key = (source_hash, Config.IMAGE_MAX_DIMENSION, Config.IMAGE_FORMAT, Config.IMAGE_QUALITY)
+
+        with cls._lock:
+            prepared = cls._cache.get(cache_key)
+            if prepared is not None:
+                cls._cache.move_to_end(cache_key)
+                cls._stats["cache_hits"] += 1
+                return prepared
+
+        data, mime_type = cls._process(raw, image_path)
+        prepared = PreparedImage(data, mime_type, source_hash, len(raw))
+
+        saved = len(raw) - len(data)
+        cls.logger.info(
+            f"🗜️ Prepared {image_path}: {len(raw) / 1024:.0f} KB -> {len(data) / 1024:.0f} KB "
+            f"({mime_type}, saved {max(saved, 0) / 1024:.0f} KB)"
+        )
+
+        with cls._lock:
+            cls._cache[cache_key] = prepared
+            while len(cls._cache) > Config.IMAGE_PREPROCESS_CACHE_SIZE:
+                cls._cache.popitem(last=False)
+            cls._stats["images"] += 1
+            cls._stats["original_bytes"] += len(raw)
+            cls._stats["processed_bytes"] += len(data)
+
+        return prepared
+
+    @staticmethod
+    def _guess_mime_type(image_path: str) -> str:
+        return mimetypes.guess_type(image_path)[0] or "image/jpeg"
+
+    @classmethod
+    def _process(cls, raw: bytes, image_path: str) -> tuple:
+        """Return (bytes, mime type), falling back to the original file when processing does not help"""
+        if not Config.IMAGE_PREPROCESSING_ENABLED or Image is None:
+            return raw, cls._guess_mime_type(image_path)
+
+        try:
+            with Image.open(io.BytesIO(raw)) as original:
+                source_format = original.format
+                rotated = original.getexif().get(0x0112, 1) not in (None, 1)
+                # Returns an upright copy, so the resize below never touches the original
+                image = ImageOps.exif_transpose(original)
+
+                max_dimension = Config.IMAGE_MAX_DIMENSION
+                resized = max(image.size) > max_dimension
+                if resized:
+                    image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+                target_format = Config.IMAGE_FORMAT.upper()
+                if target_format == "JPEG" and image.mode != "RGB":
+                    image = cls._flatten(image)
+
+                buffer = io.BytesIO()
+                image.save(buffer, format=target_format, quality=Config.IMAGE_QUALITY, optimize=True)
+                processed = buffer.getvalue()
+        except Exception as e:
+            cls.logger.warning(f"Image preprocessing failed for {image_path}, sending original: {str(e)}")
+            return raw, cls._guess_mime_type(image_path)
+
+        if len(processed) >= len(raw) and not (resized or rotated):
+            mime_type = Image.MIME.get(source_format) or cls._guess_mime_type(image_path)
+            return raw, mime_type
+
+        return processed, Image.MIME.get(target_format, f"image/{target_format.lower()}")
+
+    @staticmethod
+    def _flatten(image):
+        """Convert to RGB, compositing any transparency onto white"""
+        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+            rgba = image.convert("RGBA")
+            background = Image.new("RGB", rgba.size, (255, 255, 255))
+            background.paste(rgba, mask=rgba.split()[-1])
+            return background
+        return image.convert("RGB")
+
+    @classmethod
+    def stats(cls) -> Dict[str, Any]:
+        with cls._lock:
+            stats = dict(cls._stats)
+        stats["bytes_saved"] = stats["original_bytes"] - stats["processed_bytes"]
+        stats["pillow_available"] = Image is not None
+        return stats
@@ -1,20 +1,50 @@
 # utils/llm_models_utils.py
+import asyncio
 import base64
+import hashlib
+import json
 import logging
-import requests
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional
 from config import Config
+from utils.http_client import post_json, post_json_async
+from utils.image_preprocessing import ImagePreprocessor, PreparedImage
+from utils.metrics import (record_circuit_rejection, record_openrouter_request, record_openrouter_retry,
+                           record_token_usage, span)
+from utils.openrouter_scheduler import get_scheduler, is_failover_status
+from utils.response_cache import cache_bypassed, get_text_cache, get_vision_cache
+from utils.single_flight import SingleFlight
+from utils.traffic_control import CircuitOpenError, parse_retry_after, retry_delay
 
+# Identical vision/text requests already in flight (same image or text, prompt and models) are sent once
+_in_flight = SingleFlight()
 
-def call_vision_model(image_path: str, prompt: str) -> str:
-    key = Config.OPENROUTER_API_KEYS[0]
-    model = Config.VISION_MODELS[0]
 
+def _single_flight(key: tuple, fn: Callable[[], Any]) -> Any:
+    if not Config.SINGLE_FLIGHT_ENABLED:
+        return fn()
+    return _in_flight.do(key, fn)
+
+
+def _encode_image(image_bytes: bytes) -> str:
     # تحويل الصورة إلى base64
-    with open(image_path, "rb") as f:
-        b64_img = base64.b64encode(f.read()).decode("utf-8")
+    return base64.b64encode(image_bytes).decode("utf-8")
 
-    # إعداد الطلب
-    payload = {
+
+def _vision_cache_key(image: PreparedImage, prompt: str, models: List[str]) -> str:
+    # Keyed by the preferred model; a fallback model's answer is cached under it too
+    return get_vision_cache().make_key("vision", image.source_hash, prompt, models[0])
+
+
+def _build_headers(key: str) -> Dict[str, str]:
+    return {
+        "Authorization": f"Bearer {key}",
+        "Content-Type": "application/json"
+    }
+
+
+def _build_vision_payload(model: str, prompt: str, b64_img: str, mime_type: str) -> Dict[str, Any]:
+    return {
         "model": model,
         "messages": [
             {
@@ -27,7 +57,7 @@ def call_vision_model(image_path: str, prompt: str) -> str:
                     {
                         "type": "image_url",
                         "image_url": {
-                            "url": f"data:image/jpeg;base64,{b64_img}"
+                            "url": f"data:{mime_type};base64,{b64_img}"
                         }
                     }
                 ]
@@ -35,57 +65,421 @@ def call_vision_model(image_path: str, prompt: str) -> str:
         ]
     }
 
-    headers = {
-        "Authorization": f"Bearer {key}",
-        "Content-Type": "application/json"
+
+def _build_text_payload(model: str, description: str, prompt: str, stream: bool = False) -> Dict[str, Any]:
+    # Callers that already embedded their input in the prompt pass an empty description
+    full_prompt = prompt.strip()
+    if description.strip():
+        full_prompt += f"\n\nDescription:\n{description.strip()}"
+    payload = {
+        "model": model,
+        "messages": [
+            {"role": "user", "content": full_prompt}
+        ],
+        "max_tokens": Config.MAX_TOKENS_TEXT
     }
+    if stream:
+        payload["stream"] = True
+    return payload
 
-    # إرسال الطلب إلى OpenRouter
-    response = requests.post("https://openrouter.ai/api/v1/chat/completions", json=payload, headers=headers)
 
+def _parse_vision_response(response) -> str:
     if not response.ok:
         raise Exception(f"Failed to call vision model: {response.status_code} {response.text}")
 
     return response.json()["choices"][0]["message"]["content"]
 
 
-def call_text_model(description: str, prompt: str) -> str:
-    key = Config.OPENROUTER_API_KEYS[0]
-    model = Config.TEXT_MODELS[0]
+def _parse_text_response(response) -> str:
+    if not response.ok:
+        logging.error(f"❌ OpenRouter response error: {response.status_code} {response.text}")
+        return "⚠️ LLM analysis failed due to API error."
 
-    full_prompt = f"{prompt.strip()}\n\nDescription:\n{description.strip()}"
-    payload = {
-        "model": model,
-        "messages": [
-            {"role": "user", "content": full_prompt}
-        ],
-        "max_tokens": Config.MAX_TOKENS_TEXT
-    }
+    data = response.json()
 
-    headers = {
-        "Authorization": f"Bearer {key}",
-        "Content-Type": "application/json"
-    }
+    # Check full structure
+    content = data.get("choices", [{}])[0].get("message", {}).get("content")
+    if content:
+        return content.strip()
+    else:
+        logging.warning("⚠️ No content returned from OpenRouter:")
+        logging.debug(data)
+        return "⚠️ No content returned from the LLM."
+
+
+def _iter_stream_deltas(response) -> Iterator[str]:
+    """Content deltas of an OpenRouter streaming (server-sent events) response"""
+    for raw_line in response.iter_lines():
+        # Blank lines separate events; lines starting with ":" are keep-alive comments
+        line = raw_line.decode("utf-8")
+        if not line.startswith("data:"):
+            continue
+
+        data = line[len("data:"):].strip()
+        if data == "[DONE]":
+            return
+
+        chunk = json.loads(data)
+        if "error" in chunk:
+            raise Exception(f"Stream error from OpenRouter: {chunk['error']}")
+        # The final chunk carries the usage block
+        record_token_usage("text", chunk.get("model", "unknown"), chunk.get("usage"))
+
+        choices = chunk.get("choices") or [{}]
+        delta = choices[0].get("delta", {}).get("content")
+        if delta:
+            yield delta
+
+
+def _check_models(models: List[str]) -> List[str]:
+    if not models:
+        raise ValueError("No OpenRouter models configured for this call.")
+    return models
 
+
+def _record_response_metrics(kind: str, model: str, response, seconds: float, streamed: bool = False):
+    """Request duration/status and, for complete responses, token usage"""
+    record_openrouter_request(kind, model, str(response.status_code), seconds)
+    if streamed or not response.ok:
+        return
     try:
-        logging.info("📤 Sending request to OpenRouter for text model...")
-        response = requests.post("https://openrouter.ai/api/v1/chat/completions", json=payload, headers=headers)
+        record_token_usage(kind, model, response.json().get("usage"))
+    except ValueError:
+        pass
+
+
+def _next_delay(kind: str, model: str, attempt: int, retry_after: Optional[float], reason: str) -> Optional[float]:
+    """Seconds to wait before retrying the same model, or None to move on to the next one"""
+    if attempt >= Config.OPENROUTER_MAX_RETRIES:
+        return None
+    delay = retry_delay(attempt, retry_after, Config.OPENROUTER_RETRY_BASE_SECONDS, Config.OPENROUTER_RETRY_MAX_SECONDS)
+    if delay is not None:
+        record_openrouter_retry(kind, model, reason)
+        logging.warning(f"🔁 {model} {reason}, retrying in {delay:.1f}s")
+    return delay
+
+
+def _send_with_fallback(models: List[str], build_payload: Callable[[str], Dict[str, Any]], kind: str = "text",
+                        **post_kwargs):
+    """
+    Send the request through the next available key, retrying 429/5xx and transport errors
+    on the same model with jittered backoff (honoring Retry-After), then failing over to the
+    next model. Models whose circuit is open on every key are skipped without a request.
+    The last model's response is returned as-is.
+    post_kwargs are passed to post_json (e.g. stream=True); kind labels the metrics.
+    With stream=True the returned response keeps its concurrency slot, so the stream counts
+    as in flight; the caller must call get_scheduler().release_slot() once it is consumed or closed.
+    """
+    scheduler = get_scheduler()
+    stream = post_kwargs.get("stream", False)
+    last_error = None
+
+    for index, model in enumerate(_check_models(models)):
+        is_last = index == len(models) - 1
+        for attempt in range(Config.OPENROUTER_MAX_RETRIES + 1):
+            try:
+                key = scheduler.acquire_key(model)
+            except CircuitOpenError as e:
+                record_circuit_rejection(kind, model)
+                logging.warning(f"⚡ {str(e)}, skipping")
+                last_error = e
+                break
+
+            started = time.perf_counter()
+            scheduler.acquire_slot()
+            try:
+                response = post_json(Config.OPENROUTER_API_URL, build_payload(model), _build_headers(key),
+                                     **post_kwargs)
+            except Exception as e:
+                scheduler.release_slot()
+                elapsed = time.perf_counter() - started
+                scheduler.record(key, model, None, elapsed)
+                record_openrouter_request(kind, model, "exception", elapsed)
+                logging.warning(f"⚠️ Request to {model} failed: {str(e)}")
+                last_error = e
+                delay = _next_delay(kind, model, attempt, None, "failed")
+                if delay is None:
+                    break
+                time.sleep(delay)
+                continue
+
+            if not stream:
+                scheduler.release_slot()
+            elapsed = time.perf_counter() - started
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            scheduler.record(key, model, response.status_code, elapsed, retry_after)
+            _record_response_metrics(kind, model, response, elapsed, streamed=stream)
+            if not is_failover_status(response.status_code):
+                return response
+
+            delay = _next_delay(kind, model, attempt, retry_after, f"returned {response.status_code}")
+            if delay is None and is_last:
+                return response
+            response.close()
+            if stream:
+                scheduler.release_slot()
+            if delay is None:
+                logging.warning(f"⚠️ {model} returned {response.status_code}, falling back to next model")
+                break
+            time.sleep(delay)
+
+    raise last_error
+
+
+async def _send_with_fallback_async(models: List[str], build_payload: Callable[[str], Dict[str, Any]],
+                                    kind: str = "text"):
+    """Asyncio variant of _send_with_fallback"""
+    scheduler = get_scheduler()
+    last_error = None
 
-        if not response.ok:
-            logging.error(f"❌ OpenRouter response error: {response.status_code} {response.text}")
-            return "⚠️ LLM analysis failed due to API error."
+    for index, model in enumerate(_check_models(models)):
+        is_last = index == len(models) - 1
+        for attempt in range(Config.OPENROUTER_MAX_RETRIES + 1):
+            try:
+                key = await scheduler.acquire_key_async(model)
+            except CircuitOpenError as e:
+                record_circuit_rejection(kind, model)
+                logging.warning(f"⚡ {str(e)}, skipping")
+                last_error = e
+                break
 
-        data = response.json()
+            started = time.perf_counter()
+            try:
+                async with scheduler.slot_async():
+                    response = await post_json_async(Config.OPENROUTER_API_URL, build_payload(model),
+                                                     _build_headers(key))
+            except Exception as e:
+                elapsed = time.perf_counter() - started
+                scheduler.record(key, model, None, elapsed)
+                record_openrouter_request(kind, model, "exception", elapsed)
+                logging.warning(f"⚠️ Request to {model} failed: {str(e)}")
+                last_error = e
+                delay = _next_delay(kind, model, attempt, None, "failed")
+                if delay is None:
+                    break
+                await asyncio.sleep(delay)
+                continue
 
-        # Check full structure
-        content = data.get("choices", [{}])[0].get("message", {}).get("content")
-        if content:
-            return content.strip()
-        else:
-            logging.warning("⚠️ No content returned from OpenRouter:")
-            logging.debug(data)
-            return "⚠️ No content returned from the LLM."
+            elapsed = time.perf_counter() - started
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            scheduler.record(key, model, response.status_code, elapsed, retry_after)
+            _record_response_metrics(kind, model, response, elapsed)
+            if not is_failover_status(response.status_code):
+                return response
+
+            delay = _next_delay(kind, model, attempt, retry_after, f"returned {response.status_code}")
+            if delay is None and is_last:
+                return response
+            if delay is None:
+                logging.warning(f"⚠️ {model} returned {response.status_code}, falling back to next model")
+                break
+            await asyncio.sleep(delay)
+
+    raise last_error
+
+
+def get_usage_report() -> Dict[str, Any]:
+    """Per-key and per-model call counters collected by the scheduler, plus cache statistics"""
+    report = get_scheduler().usage()
+    vision_cache = get_vision_cache()
+    report["vision_cache"] = vision_cache.stats() if vision_cache else None
+    text_cache = get_text_cache()
+    report["text_cache"] = text_cache.stats() if text_cache else None
+    report["image_preprocessing"] = ImagePreprocessor.stats()
+    report["single_flight"] = _in_flight.stats()
+    return report
+
+
+def call_vision_model(image_path: str, prompt: str, models: Optional[List[str]] = None) -> str:
+    models = _check_models(models or Config.VISION_MODELS)
+    image = ImagePreprocessor.prepare(image_path)
+
+    with span("vision_call"):
+        return _single_flight(
+            ("vision", image.source_hash, prompt, tuple(models), cache_bypassed()),
+            lambda: _call_vision_prepared(image_path, image, prompt, models)
+        )
+
+
+def _call_vision_prepared(image_path: str, image: PreparedImage, prompt: str, models: List[str]) -> str:
+    cache = get_vision_cache()
+    cache_key = _vision_cache_key(image, prompt, models) if cache else None
+    if cache and not cache_bypassed():
+        cached = cache.get(cache_key)
+        if cached is not None:
+            logging.info(f"♻️ Vision cache hit for {image_path}")
+            return cached
+
+    b64_img = _encode_image(image.data)
+
+    # إرسال الطلب إلى OpenRouter
+    response = _send_with_fallback(
+        models, lambda model: _build_vision_payload(model, prompt, b64_img, image.mime_type), kind="vision"
+    )
+    content = _parse_vision_response(response)
+
+    if cache:
+        cache.set(cache_key, content)
+    return content
+
+
+async def call_vision_model_async(image_path: str, prompt: str, models: Optional[List[str]] = None) -> str:
+    """Asyncio variant of call_vision_model sharing one keep-alive session per event loop"""
+    models = _check_models(models or Config.VISION_MODELS)
+    image = await asyncio.to_thread(ImagePreprocessor.prepare, image_path)
+
+    cache = get_vision_cache()
+    cache_key = _vision_cache_key(image, prompt, models) if cache else None
+    if cache and not cache_bypassed():
+        cached = cache.get(cache_key)
+        if cached is not None:
+            logging.info(f"♻️ Vision cache hit for {image_path}")
+            return cached
+
+    b64_img = _encode_image(image.data)
+
+    response = await _send_with_fallback_async(
+        models, lambda model: _build_vision_payload(model, prompt, b64_img, image.mime_type), kind="vision"
+    )
+    content = _parse_vision_response(response)
+
+    if cache:
+        cache.set(cache_key, content)
+    return content
+
+
+def _text_cache_key(description: str, prompt: str, models: List[str]) -> str:
+    # Full prompt as sent, keyed by the preferred model like the vision cache
+    full_prompt = _build_text_payload(models[0], description, prompt)["messages"][0]["content"]
+    return get_text_cache().make_key("text", hashlib.sha256(full_prompt.encode("utf-8")).hexdigest(),
+                                     models[0], Config.MAX_TOKENS_TEXT)
+
+
+def _cached_text(description: str, prompt: str, models: List[str], use_cache: bool,
+                 cacheable: Optional[Callable[[str], bool]] = None):
+    """(cache, key, cached response or None); reads are skipped when bypassed"""
+    cache = get_text_cache()
+    if not cache or not models:
+        return None, None, None
+    cache_key = _text_cache_key(description, prompt, models)
+    if not use_cache or cache_bypassed():
+        return cache, cache_key, None
+    cached = cache.get(cache_key)
+    if cached is not None and cacheable is not None and not cacheable(cached):
+        cached = None  # Stored before the caller could reject it
+    if cached is not None:
+        logging.info("♻️ Text cache hit")
+    return cache, cache_key, cached
+
+
+def _store_text(cache, cache_key: str, content: str, cacheable: Optional[Callable[[str], bool]] = None):
+    # Warning strings stand for failures and must be retried, not replayed; so do answers the caller can't use
+    if cache and content and not content.startswith("⚠️") and (cacheable is None or cacheable(content)):
+        cache.set(cache_key, content)
+
+
+def call_text_model(description: str, prompt: str, models: Optional[List[str]] = None,
+                    use_cache: bool = True, cacheable: Optional[Callable[[str], bool]] = None) -> str:
+    """
+    use_cache=False (or bypass_cache()) skips cached answers; the fresh answer is still stored.
+    cacheable, if given, decides whether an answer may be stored or replayed (e.g. it parses as JSON).
+    """
+    models = models or Config.TEXT_MODELS
+    read_cache = use_cache and not cache_bypassed()
+
+    with span("text_call") as labels:
+        result = _single_flight(
+            ("text", description, prompt, tuple(models), Config.MAX_TOKENS_TEXT, read_cache),
+            lambda: _call_text(description, prompt, models, read_cache, cacheable)
+        )
+        # Failures come back as warning strings rather than exceptions
+        if result.startswith("⚠️"):
+            labels["status"] = "error"
+        return result
+
+
+def _call_text(description: str, prompt: str, models: List[str], use_cache: bool,
+               cacheable: Optional[Callable[[str], bool]] = None) -> str:
+    cache, cache_key, cached = _cached_text(description, prompt, models, use_cache, cacheable)
+    if cached is not None:
+        return cached
+
+    try:
+        logging.info("📤 Sending request to OpenRouter for text model...")
+        response = _send_with_fallback(models, lambda model: _build_text_payload(model, description, prompt))
+        content = _parse_text_response(response)
 
     except Exception as e:
         logging.error(f"❌ Exception in call_text_model: {str(e)}")
         return "⚠️ LLM compliance analysis failed due to an exception."
+
+    _store_text(cache, cache_key, content, cacheable)
+    return content
+
+
+async def call_text_model_async(description: str, prompt: str, models: Optional[List[str]] = None,
+                                use_cache: bool = True, cacheable: Optional[Callable[[str], bool]] = None) -> str:
+    """Asyncio variant of call_text_model sharing one keep-alive session per event loop"""
+    models = models or Config.TEXT_MODELS
+    cache, cache_key, cached = _cached_text(description, prompt, models, use_cache, cacheable)
+    if cached is not None:
+        return cached
+
+    try:
+        logging.info("📤 Sending async request to OpenRouter for text model...")
+        response = await _send_with_fallback_async(
+            models, lambda model: _build_text_payload(model, description, prompt)
+        )
+        content = _parse_text_response(response)
+
+    except Exception as e:
+        logging.error(f"❌ Exception in call_text_model_async: {str(e)}")
+        return "⚠️ LLM compliance analysis failed due to an exception."
+
+    _store_text(cache, cache_key, content, cacheable)
+    return content
+
+
+def call_text_model_stream(description: str, prompt: str, models: Optional[List[str]] = None,
+                           use_cache: bool = True, cacheable: Optional[Callable[[str], bool]] = None) -> Iterator[str]:
+    """
+    Streaming variant of call_text_model: yields content chunks as OpenRouter produces them.
+    Model failover happens before the first chunk; failures yield the same warning strings.
+    A cached answer is yielded as a single chunk; a complete streamed answer is cached.
+    """
+    models = models or Config.TEXT_MODELS
+    cache, cache_key, cached = _cached_text(description, prompt, models, use_cache, cacheable)
+    if cached is not None:
+        yield cached
+        return
+
+    try:
+        logging.info("📤 Sending streaming request to OpenRouter for text model...")
+        response = _send_with_fallback(
+            models, lambda model: _build_text_payload(model, description, prompt, stream=True), stream=True
+        )
+    except Exception as e:
+        logging.error(f"❌ Exception in call_text_model_stream: {str(e)}")
+        yield "⚠️ LLM compliance analysis failed due to an exception."
+        return
+
+    # The concurrency slot stays taken until the stream is consumed or the generator is closed
+    try:
+        with response:
+            if not response.ok:
+                yield _parse_text_response(response)
+                return
+
+            chunks = []
+            try:
+                for chunk in _iter_stream_deltas(response):
+                    chunks.append(chunk)
+                    yield chunk
+            except Exception as e:
+                logging.error(f"❌ Exception while streaming from OpenRouter: {str(e)}")
+                yield "⚠️ LLM compliance analysis failed due to an exception."
+                return
+    finally:
+        get_scheduler().release_slot()
+
+    _store_text(cache, cache_key, "".join(chunks).strip(), cacheable)
@@ -0,0 +1,148 @@
+# utils/metrics.py
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Seconds; spans range from millisecond retrievals to multi-minute table generations
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+logger = logging.getLogger(__name__)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help_text = help_text
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(sorted((name, str(value)) for name, value in labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value:g}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts..., sum, count]
+        self._values: Dict[tuple, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted((name, str(label)) for name, label in labels.items()))
+        with self._lock:
+            state = self._values.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, state):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', f'{bound:g}'))} {count:g}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {state[-1]:g}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {state[-2]:.6f}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {state[-1]:g}")
+        return lines
+
+
+_registry: Dict[str, object] = {}
+_registry_lock = threading.Lock()
+
+
+def counter(name: str, help_text: str) -> Counter:
+    with _registry_lock:
+        return _registry.setdefault(name, Counter(name, help_text))
+
+
+def histogram(name: str, help_text: str, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    with _registry_lock:
+        return _registry.setdefault(name, Histogram(name, help_text, buckets))
+
+
+STAGE_SECONDS = histogram("compliance_stage_duration_seconds", "Wall time of pipeline stages")
+OPENROUTER_SECONDS = histogram("openrouter_request_duration_seconds", "Wall time of OpenRouter HTTP requests")
+OPENROUTER_REQUESTS = counter("openrouter_requests_total", "OpenRouter HTTP requests by model and status")
+OPENROUTER_TOKENS = counter("openrouter_tokens_total", "Tokens reported by OpenRouter usage blocks")
+OPENROUTER_RETRIES = counter("openrouter_retries_total", "OpenRouter requests retried on the same model")
+OPENROUTER_CIRCUIT_REJECTIONS = counter("openrouter_circuit_rejections_total",
+                                        "Calls failed fast because every key's circuit for the model was open")
+
+
+@contextmanager
+def span(stage: str, **labels) -> Iterator[Dict[str, str]]:
+    """
+    Time a block into compliance_stage_duration_seconds{stage, status, ...}. The yielded
+    dict can be updated with extra labels; status becomes "error" if the block raises.
+    """
+    extra: Dict[str, str] = {}
+    status = "ok"
+    started = time.perf_counter()
+    try:
+        yield extra
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        all_labels = {**labels, **extra, "stage": stage, "status": extra.get("status", status)}
+        STAGE_SECONDS.observe(elapsed, **all_labels)
+        logger.debug(f"span stage={stage} seconds={elapsed:.4f} labels={all_labels}")
+
+
+def record_openrouter_request(kind: str, model: str, status: str, seconds: float):
+    OPENROUTER_SECONDS.observe(seconds, kind=kind, model=model, status=status)
+    OPENROUTER_REQUESTS.inc(kind=kind, model=model, status=status)
+
+
+def record_openrouter_retry(kind: str, model: str, reason: str):
+    OPENROUTER_RETRIES.inc(kind=kind, model=model, reason=reason)
+
+
+def record_circuit_rejection(kind: str, model: str):
+    OPENROUTER_CIRCUIT_REJECTIONS.inc(kind=kind, model=model)
+
+
+def record_token_usage(kind: str, model: str, usage: Optional[Dict]):
+    if not usage:
+        return
+    for token_type in ("prompt_tokens", "completion_tokens"):
+        if usage.get(token_type):
+            OPENROUTER_TOKENS.inc(usage[token_type], kind=kind, model=model, type=token_type.split("_")[0])
+
+
+def render_prometheus() -> str:
+    """All registered metrics in the Prometheus text exposition format"""
+    with _registry_lock:
+        metrics = list(_registry.values())
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,250 @@
+# utils/openrouter_scheduler.py
+import asyncio
+import logging
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Iterator, List, Optional
+
+from config import Config
+from utils.traffic_control import AdaptiveConcurrencyLimiter, CircuitBreaker, CircuitOpenError
+
+# Upstream statuses that move a call on to the next model in the list
+FAILOVER_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def is_failover_status(status_code: int) -> bool:
+    return status_code in FAILOVER_STATUS_CODES or status_code >= 500
+
+
+def mask_key(key: str) -> str:
+    """Short, log-safe label for an API key"""
+    return f"{key[:8]}…{key[-4:]}" if len(key) > 12 else "…"
+
+
+class TokenBucket:
+    """Classic token bucket: `rate` tokens per second, holding at most `capacity`"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = max(rate, 1e-6)
+        self.capacity = max(capacity, 1)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self) -> float:
+        """Take a token if available; otherwise return the seconds until one is"""
+        with self.lock:
+            self._refill(time.monotonic())
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0.0
+            return (1 - self.tokens) / self.rate
+
+
+class OpenRouterScheduler:
+    """
+    Spreads calls across all configured API keys, each limited by its own token bucket,
+    and keeps per-key and per-model usage counters. Keys whose circuit for the requested
+    model is open, or that are cooling down after a Retry-After, are skipped; the optional
+    limiter bounds requests in flight.
+    """
+
+    def __init__(self, keys: List[str], rate: float, burst: int,
+                 limiter: Optional[AdaptiveConcurrencyLimiter] = None,
+                 failure_threshold: int = 5, reset_seconds: float = 30.0, max_cooldown_wait: float = 10.0):
+        if not keys:
+            raise ValueError("No OpenRouter API keys configured. Set OPENROUTER_API_KEYS.")
+
+        self.keys = list(keys)
+        self.buckets = {key: TokenBucket(rate, burst) for key in self.keys}
+        self.limiter = limiter
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.max_cooldown_wait = max_cooldown_wait
+        self._breakers: Dict[tuple, CircuitBreaker] = {}
+        self._cooldowns: Dict[str, float] = {}  # key -> monotonic time its Retry-After ends
+        self._rejections: Dict[str, int] = {}
+        self._next = 0
+        self._lock = threading.Lock()
+        self._key_usage = {key: self._empty_usage() for key in self.keys}
+        self._model_usage: Dict[str, Dict[str, int]] = {}
+
+    @staticmethod
+    def _empty_usage() -> Dict[str, int]:
+        return {"requests": 0, "successes": 0, "rate_limited": 0, "errors": 0, "wait_ms": 0}
+
+    def _breaker(self, key: str, model: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get((key, model))
+            if breaker is None:
+                breaker = self._breakers[(key, model)] = CircuitBreaker(self.failure_threshold, self.reset_seconds)
+            return breaker
+
+    def _try_keys(self, model: Optional[str] = None) -> tuple:
+        """
+        Round-robin over keys; returns (key, 0) on success, (None, shortest wait) when
+        usable keys are throttled or cooling down, or (None, None) when every key's circuit is open
+        """
+        with self._lock:
+            start = self._next
+            self._next = (self._next + 1) % len(self.keys)
+            cooldowns = dict(self._cooldowns)
+
+        now = time.monotonic()
+        shortest_wait = None
+        for offset in range(len(self.keys)):
+            key = self.keys[(start + offset) % len(self.keys)]
+            breaker = self._breaker(key, model) if model else None
+            if breaker and not breaker.allow():
+                continue
+            wait = max(cooldowns.get(key, 0.0) - now, 0.0) or self.buckets[key].try_acquire()
+            if wait == 0:
+                return key, 0.0
+            if breaker:
+                breaker.release_probe()
+            shortest_wait = wait if shortest_wait is None else min(shortest_wait, wait)
+        return None, shortest_wait
+
+    def _next_wait(self, model: Optional[str], wait: Optional[float]) -> float:
+        """Seconds to wait for a key, or raise CircuitOpenError when the model cannot be served soon enough"""
+        if wait is not None and wait <= self.max_cooldown_wait:
+            return wait
+        with self._lock:
+            self._rejections[model] = self._rejections.get(model, 0) + 1
+        if wait is None:
+            raise CircuitOpenError(f"Circuit open for {model} on every API key")
+        raise CircuitOpenError(f"Every API key is cooling down for {model} for another {wait:.1f}s")
+
+    def acquire_key(self, model: Optional[str] = None) -> str:
+        """
+        Block until some key has capacity and return it. Raises CircuitOpenError if every
+        key's circuit for model is open, or if the earliest key frees up after max_cooldown_wait.
+        """
+        started = time.monotonic()
+        while True:
+            key, wait = self._try_keys(model)
+            if key is not None:
+                self._record_wait(key, started)
+                return key
+            time.sleep(self._next_wait(model, wait))
+
+    async def acquire_key_async(self, model: Optional[str] = None) -> str:
+        """Asyncio variant of acquire_key that yields to the event loop while waiting"""
+        started = time.monotonic()
+        while True:
+            key, wait = self._try_keys(model)
+            if key is not None:
+                self._record_wait(key, started)
+                return key
+            await asyncio.sleep(self._next_wait(model, wait))
+
+    def acquire_slot(self):
+        """Take one of the limiter's in-flight slots; pair with release_slot()"""
+        if self.limiter is not None:
+            self.limiter.acquire()
+
+    def release_slot(self):
+        if self.limiter is not None:
+            self.limiter.release()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold one of the limiter's in-flight slots for the duration of a request"""
+        self.acquire_slot()
+        try:
+            yield
+        finally:
+            self.release_slot()
+
+    @asynccontextmanager
+    async def slot_async(self):
+        if self.limiter is None:
+            yield
+            return
+        async with self.limiter.slot_async():
+            yield
+
+    def _record_wait(self, key: str, started: float):
+        with self._lock:
+            self._key_usage[key]["wait_ms"] += int((time.monotonic() - started) * 1000)
+
+    def record(self, key: str, model: str, status_code: Optional[int],
+               seconds: Optional[float] = None, retry_after: Optional[float] = None):
+        """
+        Record the outcome of one call; status_code is None for transport errors. 429/5xx and
+        transport errors count against the key/model circuit and shrink the concurrency limit;
+        a Retry-After keeps the key out of rotation until it has passed.
+        """
+        overloaded = status_code is None or is_failover_status(status_code)
+        breaker = self._breaker(key, model)
+        if overloaded:
+            breaker.record_failure()
+        else:
+            breaker.record_success()
+        if retry_after:
+            with self._lock:
+                self._cooldowns[key] = max(self._cooldowns.get(key, 0.0), time.monotonic() + retry_after)
+        if self.limiter is not None:
+            self.limiter.on_result(model, overloaded, seconds)
+
+        with self._lock:
+            key_usage = self._key_usage[key]
+            model_usage = self._model_usage.setdefault(model, self._empty_usage())
+            for usage in (key_usage, model_usage):
+                usage["requests"] += 1
+                if status_code is not None and status_code < 400:
+                    usage["successes"] += 1
+                elif status_code == 429:
+                    usage["rate_limited"] += 1
+                else:
+                    usage["errors"] += 1
+
+    def usage(self) -> Dict[str, Dict[str, Dict[str, int]]]:
+        """Snapshot of per-key (masked) and per-model counters, circuits and the concurrency limit"""
+        with self._lock:
+            breakers = dict(self._breakers)
+            report = {
+                "keys": {mask_key(key): dict(usage) for key, usage in self._key_usage.items()},
+                "models": {model: dict(usage) for model, usage in self._model_usage.items()},
+                "circuit_rejections": dict(self._rejections)
+            }
+        report["circuits"] = {
+            f"{mask_key(key)}/{model}": breaker.snapshot() for (key, model), breaker in breakers.items()
+        }
+        report["concurrency"] = self.limiter.stats() if self.limiter is not None else None
+        return report
+
+
+_scheduler: Optional[OpenRouterScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler() -> OpenRouterScheduler:
+    """Process-wide scheduler built from Config on first use"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                limiter = None
+                if Config.OPENROUTER_ADAPTIVE_CONCURRENCY:
+                    limiter = AdaptiveConcurrencyLimiter(
+                        Config.OPENROUTER_CONCURRENCY_INITIAL,
+                        Config.OPENROUTER_CONCURRENCY_MIN,
+                        Config.OPENROUTER_CONCURRENCY_MAX
+                    )
+                _scheduler = OpenRouterScheduler(
+                    Config.OPENROUTER_API_KEYS,
+                    Config.OPENROUTER_KEY_RATE,
+                    Config.OPENROUTER_KEY_BURST,
+                    limiter=limiter,
+                    failure_threshold=Config.CIRCUIT_BREAKER_FAILURES,
+                    reset_seconds=Config.CIRCUIT_BREAKER_RESET_SECONDS,
+                    max_cooldown_wait=Config.OPENROUTER_RETRY_MAX_SECONDS
+                )
+                logging.info(f"🔑 OpenRouter scheduler using {len(Config.OPENROUTER_API_KEYS)} API key(s)")
+    return _scheduler
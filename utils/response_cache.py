@@ -0,0 +1,174 @@
+# utils/response_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional
+
+from config import Config
+
+
+class ResponseCache:
+    """
+    Persistent string cache backed by SQLite, bounded by entry count (least recently
+    used entries are evicted first) and by age. Safe to share across threads and,
+    thanks to WAL mode, across worker processes.
+    """
+
+    def __init__(self, path: str, max_entries: int, ttl_seconds: float, name: str = "cache"):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+        self.ttl_seconds = ttl_seconds
+        self.name = name
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        """Stable hash of the parts that determine a response"""
+        digest = hashlib.sha256()
+        for part in parts:
+            digest.update(str(part).encode("utf-8"))
+            digest.update(b"\x1f")
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+
+            if row is None:
+                self._misses += 1
+                return None
+
+            value, created_at = row
+            if self.ttl_seconds and now - created_at > self.ttl_seconds:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                self._misses += 1
+                return None
+
+            self._conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self._hits += 1
+            return value
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drop expired entries, then the least recently used ones beyond max_entries"""
+        if self.ttl_seconds:
+            cursor = self._conn.execute(
+                "DELETE FROM entries WHERE created_at < ?", (time.time() - self.ttl_seconds,)
+            )
+            self._evictions += max(cursor.rowcount, 0)
+
+        count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        overflow = count - self.max_entries
+        if overflow > 0:
+            cursor = self._conn.execute(
+                "DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY accessed_at ASC LIMIT ?)",
+                (overflow,)
+            )
+            self._evictions += max(cursor.rowcount, 0)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            lookups = self._hits + self._misses
+            return {
+                "name": self.name,
+                "entries": entries,
+                "max_entries": self.max_entries,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "evictions": self._evictions
+            }
+
+
+_vision_cache: Optional[ResponseCache] = None
+_text_cache: Optional[ResponseCache] = None
+_caches_lock = threading.Lock()
+
+# Set for the duration of a request that must not be answered from the response caches.
+# Fresh responses are still written, so a bypassed request also refreshes the cache.
+_bypass = ContextVar("response_cache_bypass", default=False)
+
+
+@contextmanager
+def bypass_cache(enabled: bool = True) -> Iterator[None]:
+    """Skip response cache reads in this context (and in work submitted with its copied context)"""
+    token = _bypass.set(enabled)
+    try:
+        yield
+    finally:
+        _bypass.reset(token)
+
+
+def cache_bypassed() -> bool:
+    return _bypass.get()
+
+
+def get_vision_cache() -> Optional[ResponseCache]:
+    """Process-wide vision response cache, or None when disabled in Config"""
+    global _vision_cache
+    if not Config.VISION_CACHE_ENABLED:
+        return None
+    if _vision_cache is None:
+        with _caches_lock:
+            if _vision_cache is None:
+                _vision_cache = ResponseCache(
+                    os.path.join(Config.CACHE_DIR, "vision_responses.sqlite3"),
+                    max_entries=Config.VISION_CACHE_MAX_ENTRIES,
+                    ttl_seconds=Config.VISION_CACHE_TTL_SECONDS,
+                    name="vision"
+                )
+    return _vision_cache
+
+
+def get_text_cache() -> Optional[ResponseCache]:
+    """Process-wide text model response cache, or None when disabled in Config"""
+    global _text_cache
+    if not Config.TEXT_CACHE_ENABLED:
+        return None
+    if _text_cache is None:
+        with _caches_lock:
+            if _text_cache is None:
+                _text_cache = ResponseCache(
+                    os.path.join(Config.CACHE_DIR, "text_responses.sqlite3"),
+                    max_entries=Config.TEXT_CACHE_MAX_ENTRIES,
+                    ttl_seconds=Config.TEXT_CACHE_TTL_SECONDS,
+                    name="text"
+                )
+    return _text_cache
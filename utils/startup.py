@@ -0,0 +1,45 @@
+# utils/startup.py
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List
+
+
+class StartupReport:
+    """Wall time of each import and init step between process start and serving"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.started_at = time.time()
+        self.steps: List[Dict[str, Any]] = []
+        self.ready_seconds = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def step(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.steps.append({"step": name, "seconds": round(time.perf_counter() - started, 4)})
+
+    def mark_ready(self):
+        self.ready_seconds = round(time.perf_counter() - self.started, 4)
+
+    def as_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "steps": list(self.steps),
+                "ready_seconds": self.ready_seconds,
+                "uptime_seconds": round(time.time() - self.started_at, 1)
+            }
+
+    def log(self, logger: logging.Logger):
+        breakdown = ", ".join(f"{step['step']} {step['seconds']:.3f}s" for step in self.steps)
+        logger.info(f"🚀 Ready in {self.ready_seconds:.3f}s ({breakdown})")
+
+
+# Created when app.py is first imported, which is as close to process start as the app can measure
+startup_report = StartupReport()
@@ -0,0 +1,46 @@
+# utils/token_budget.py
+from typing import List
+
+# Rough averages for common BPE tokenizers. ASCII (English prose, JSON) packs about 4
+# characters per token; Arabic and other non-Latin scripts take far more tokens per
+# character, so they are counted at 2 to keep estimates on the high side.
+CHARS_PER_TOKEN = 4
+NON_ASCII_CHARS_PER_TOKEN = 2
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate used for budgeting prompts (no tokenizer dependency)"""
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return ascii_chars // CHARS_PER_TOKEN + (len(text) - ascii_chars) // NON_ASCII_CHARS_PER_TOKEN + 1
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """Longest prefix of text whose estimate fits within budget"""
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) <= budget:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low]
+
+
+def pack_batches(texts: List[str], budget: int) -> List[List[int]]:
+    """
+    Group consecutive texts into batches whose estimated size stays within budget.
+    Returns indices per batch; a text larger than the budget gets a batch of its own.
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    used = 0
+    for index, text in enumerate(texts):
+        tokens = estimate_tokens(text)
+        if current and used + tokens > budget:
+            batches.append(current)
+            current, used = [], 0
+        current.append(index)
+        used += tokens
+    if current:
+        batches.append(current)
+    return batches
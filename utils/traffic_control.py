@@ -0,0 +1,231 @@
+# utils/traffic_control.py
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterator, Optional
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an upstream whose circuit is open"""
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD limit on requests in flight: +1/limit per healthy response (about +1 per round
+    trip), times `backoff` on a 429/5xx/transport error or when a model's recent latency
+    rises above `latency_tolerance` x its long-run average. At most one decrease per
+    recent-latency window, so a burst of failures from one overload counts once.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int,
+                 backoff: float = 0.5, latency_tolerance: float = 2.0):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.backoff = backoff
+        self.latency_tolerance = latency_tolerance
+        self.in_flight = 0
+        self._latency: Dict[str, list] = {}  # model -> [recent EWMA, long-run EWMA]
+        self._last_decrease = 0.0
+        self._stats = {"increases": 0, "decreases": 0, "waits": 0}
+        self._condition = threading.Condition()
+        # Coroutines waiting for a slot, as (event loop, future); threads wait on _condition
+        self._async_waiters = deque()
+
+    def try_acquire(self) -> bool:
+        with self._condition:
+            if self.in_flight < int(self.limit):
+                self.in_flight += 1
+                return True
+            return False
+
+    def acquire(self):
+        with self._condition:
+            if self.in_flight >= int(self.limit):
+                self._stats["waits"] += 1
+            while self.in_flight >= int(self.limit):
+                self._condition.wait()
+            self.in_flight += 1
+
+    async def acquire_async(self):
+        """Asyncio variant of acquire: waits on a future resolved by release(), without blocking the loop"""
+        loop = asyncio.get_running_loop()
+        waited = False
+        while True:
+            with self._condition:
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                if not waited:
+                    self._stats["waits"] += 1
+                    waited = True
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                with self._condition:
+                    if waiter.done() and not waiter.cancelled():
+                        self._wake_async()  # Woken but leaving: pass the wake-up on
+                    elif (loop, waiter) in self._async_waiters:
+                        self._async_waiters.remove((loop, waiter))
+                raise
+
+    @staticmethod
+    def _resolve(waiter):
+        if not waiter.done():
+            waiter.set_result(None)
+
+    def _wake_async(self, wake_all: bool = False):
+        """Wake waiting coroutines (caller holds _condition); they retry for a slot on their own loop"""
+        while self._async_waiters:
+            loop, waiter = self._async_waiters.popleft()
+            try:
+                loop.call_soon_threadsafe(self._resolve, waiter)
+            except RuntimeError:
+                continue  # Loop already closed
+            if not wake_all:
+                return
+
+    def release(self):
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+            self._wake_async()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def slot_async(self):
+        await self.acquire_async()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _is_slow(self, model: str, seconds: float) -> bool:
+        """Update the model's latency averages and report whether it is slower than usual"""
+        averages = self._latency.get(model)
+        if averages is None:
+            self._latency[model] = [seconds, seconds]
+            return False
+        averages[0] += 0.3 * (seconds - averages[0])
+        averages[1] += 0.02 * (seconds - averages[1])
+        return averages[0] > self.latency_tolerance * averages[1]
+
+    def on_result(self, model: str, overloaded: bool, seconds: Optional[float] = None):
+        """Feed back one finished request"""
+        with self._condition:
+            slow = not overloaded and seconds is not None and self._is_slow(model, seconds)
+            if overloaded or slow:
+                now = time.monotonic()
+                window = self._latency.get(model, [1.0])[0]
+                if now - self._last_decrease >= window:
+                    self.limit = max(self.minimum, self.limit * self.backoff)
+                    self._last_decrease = now
+                    self._stats["decreases"] += 1
+            elif self.limit < self.maximum:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                self._stats["increases"] += 1
+                self._condition.notify_all()
+                self._wake_async(wake_all=True)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "limit": int(self.limit),
+                "in_flight": self.in_flight,
+                "latency_seconds": {model: round(averages[0], 3) for model, averages in self._latency.items()},
+                **self._stats
+            }
+
+
+class CircuitBreaker:
+    """
+    Closed until `failure_threshold` consecutive failures, then open for `reset_seconds`,
+    then half-open: one probe request decides whether it closes again or reopens.
+    """
+
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_until = 0.0
+        self.state = "closed"
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now; in half-open state only one probe at a time"""
+        with self._lock:
+            if self.state == "open" and time.monotonic() >= self.opened_until:
+                self.state = "half_open"
+                self._probing = False
+            if self.state == "closed":
+                return True
+            if self.state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.state = "closed"
+            self._probing = False
+
+    def release_probe(self):
+        """Give back a claimed half-open probe that was not used (e.g. the key had no rate budget)"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                self.state = "open"
+                self.opened_until = time.monotonic() + self.reset_seconds
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            retry_in = max(0.0, self.opened_until - time.monotonic()) if self.state == "open" else 0.0
+            state = "half_open" if self.state == "open" and retry_in == 0 else self.state
+            return {"state": state, "failures": self.failures, "retry_in_seconds": round(retry_in, 1)}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def retry_delay(attempt: int, retry_after: Optional[float], base: float, cap: float) -> Optional[float]:
+    """
+    Seconds to wait before retry number `attempt` (0-based), or None when a Retry-After
+    exceeds `cap` and the caller should fail over instead. A shorter Retry-After is
+    enforced by the scheduler's key cooldown, so only a little jitter is added here;
+    otherwise full-jitter exponential backoff.
+    """
+    if retry_after is not None:
+        return None if retry_after > cap else random.uniform(0, base)
+    return random.uniform(0, min(cap, base * 2 ** attempt))